@@ -0,0 +1,175 @@
+"""
+Multi-resolution OHLCV bars derived from a base kline store.
+
+A catalog asset with `aggregate_from` (e.g. ETH/binance/4h from the 1m base)
+is not downloaded. Its bars are aggregated from the base asset's price
+store and kept in its own store, so training and inference read any
+resolution without rescanning the raw history. Updates are incremental: only
+base rows after the last stored bar are read (a binary search over the
+memory-mapped start times) and the new bars are appended.
+"""
+import os
+import re
+import json
+import logging
+import numpy as np
+import pandas as pd
+import price_store
+from latest_store import record_latest
+from kline_parser import KLINE_COLUMNS
+
+INTERVAL_MS = {"m": 60_000, "h": 3_600_000, "d": 86_400_000, "w": 604_800_000}
+
+# Binance weeks open on Monday 00:00 UTC; the epoch fell on a Thursday
+WEEK_OFFSET_MS = 4 * INTERVAL_MS["d"]
+
+# How each kline column is aggregated; columns missing from the base store are skipped
+AGGREGATIONS = {
+    "open": "first",
+    "high": "max",
+    "low": "min",
+    "close": "last",
+    "volume": "sum",
+    "volume_usd": "sum",
+    "n_trades": "sum",
+    "taker_volume": "sum",
+    "taker_volume_usd": "sum",
+}
+
+
+def interval_ms(interval):
+    """Length of a fixed-width kline interval ("1m", "4h", "1w", ...) in milliseconds."""
+    match = re.fullmatch(r"(\d+)([mhdw])", str(interval))
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Interval '{interval}' is not a fixed-width kline interval")
+    return int(match.group(1)) * INTERVAL_MS[match.group(2)]
+
+
+def check_resolution(base_interval, interval):
+    """Raise ValueError unless `interval` bars can be built from whole `base_interval` candles."""
+    base, target = interval_ms(base_interval), interval_ms(interval)
+    if target <= base or target % base:
+        raise ValueError(f"Cannot aggregate {base_interval} klines into {interval} bars")
+
+
+def resample_klines(df, interval, complete_only=True):
+    """
+    Aggregate kline rows sorted by start_time into `interval` bars.
+
+    Bars are aligned to the epoch (weeks to Monday, as on Binance). Each
+    column is reduced with np.*.reduceat over the bar boundaries: first open,
+    max high, min low, last close and summed volumes and trade counts.
+    With complete_only the last bar is dropped while its final base candle
+    has not closed yet. Returns a frame in the kline schema indexed by bar
+    close time ("date").
+    """
+    period = interval_ms(interval)
+    offset = WEEK_OFFSET_MS if period % INTERVAL_MS["w"] == 0 else 0
+    start_time = df["start_time"].to_numpy(dtype=np.int64)
+    columns = [name for name in AGGREGATIONS if name in df.columns]
+    if not len(start_time):
+        empty = pd.DataFrame({"start_time": np.empty(0, np.int64), "end_time": np.empty(0, np.int64)})
+        empty.index = pd.DatetimeIndex([], name="date")
+        return empty
+
+    bucket = (start_time - offset) // period
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(bucket)] - 1
+    bar_start = bucket[starts] * period + offset
+    bar_end = bar_start + period - 1
+
+    bars = {"start_time": bar_start}
+    for name in columns:
+        values = df[name].to_numpy()
+        how = AGGREGATIONS[name]
+        if how == "first":
+            bars[name] = values[starts]
+        elif how == "last":
+            bars[name] = values[ends]
+        elif how == "max":
+            bars[name] = np.maximum.reduceat(values, starts)
+        elif how == "min":
+            bars[name] = np.minimum.reduceat(values, starts)
+        else:
+            # Sum compact float32/int32 columns in 64 bits; a week holds 10,080 minutes
+            bars[name] = np.add.reduceat(values, starts, dtype=np.int64 if values.dtype.kind in "iu" else np.float64)
+    bars["end_time"] = bar_end
+
+    result = pd.DataFrame({name: bars[name] for name in KLINE_COLUMNS if name in bars})
+    result.index = pd.DatetimeIndex(pd.to_datetime(bar_end, unit="ms"), name="date")
+    if complete_only and int(df["end_time"].iloc[-1]) < bar_end[-1]:
+        result = result.iloc[:-1]
+    return result
+
+
+def _state_path(data_path):
+    return f"{data_path}.aggregate.json"
+
+
+def _load_state(data_path):
+    try:
+        with open(_state_path(data_path)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def new_bars(base_data_path, data_path, interval):
+    """
+    Work out the bars missing from the store at data_path.
+
+    Only base rows from the first bar after the last stored one are
+    aggregated. Incomplete bars at either end of the base history are left
+    out. Everything is rebuilt when there is no aggregate yet or the
+    base store was rewritten below the rows already aggregated. Returns a
+    dict with the bars, whether they replace the store, and the state to
+    save with them.
+    """
+    if not price_store.exists(base_data_path):
+        raise FileNotFoundError(f"No base price data at {base_data_path} to aggregate")
+    start_time = price_store.load_prices(base_data_path, columns=["start_time"])["start_time"].to_numpy(dtype=np.int64)
+    rows = len(start_time)
+
+    state = _load_state(data_path)
+    rebuild = not state or not price_store.exists(data_path)
+    if not rebuild:
+        seen_rows = state["base_rows"]
+        rebuild = seen_rows > rows or bool(seen_rows and int(start_time[seen_rows - 1]) != state["base_last_start"])
+        if rebuild:
+            logging.info(f"Base of {data_path} was rewritten, rebuilding the {interval} aggregate.")
+
+    first = 0 if rebuild else int(np.searchsorted(start_time, state["next_start"]))
+    base = price_store.load_prices(base_data_path) if first == 0 else price_store.load_tail(base_data_path, rows - first)
+    bars = resample_klines(base, interval)
+    if first == 0 and len(bars) and int(start_time[0]) > int(bars["start_time"].iloc[0]):
+        # The base history starts mid-period, so its first bar is incomplete
+        bars = bars.iloc[1:]
+    if len(bars):
+        next_start = int(bars["start_time"].iloc[-1]) + interval_ms(interval)
+    else:
+        next_start = 0 if rebuild else state["next_start"]
+    return {
+        "bars": bars,
+        "rebuild": rebuild,
+        "state": {"base_rows": rows, "base_last_start": int(start_time[-1]) if rows else None, "next_start": next_start},
+    }
+
+
+def store_bars(data_path, result):
+    """Write the bars returned by new_bars and remember how far the base was aggregated."""
+    bars = result["bars"]
+    if result["rebuild"]:
+        price_store.save_prices(bars, data_path)
+        record_latest(data_path, bars)
+    elif len(bars):
+        record_latest(data_path, price_store.append_prices(bars, data_path))
+    tmp_path = f"{_state_path(data_path)}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(result["state"], f)
+    os.replace(tmp_path, _state_path(data_path))
+    return len(bars)
+
+
+def update_aggregate(base_data_path, data_path, interval):
+    """Append the bars completed since the last update; returns the number of new bars."""
+    return store_bars(data_path, new_bars(base_data_path, data_path, interval))
@@ -1,174 +1,265 @@
-import os
 import json
-import pickle
 import pandas as pd
 import numpy as np
-import threading
+import time
 import logging
 from datetime import datetime
-from flask import Flask, jsonify, Response, request
-from model import download_binance_data, format_binance_data, download_coingecko_data, download_cmc_data, download_portalsfi_data, train_model
-from config import model_file_path, data_base_path
-import requests
-import torch
-from transformers import pipeline
+from flask import Flask, jsonify, Response, request, g
+from update_coordinator import update_coordinator
+from config import prediction_precompute_buckets, shared_snapshot_enabled
+from assets import catalog, find_asset
+from model_registry import model_registry
+from shared_snapshot import publish_catalog
+from prediction_cache import prediction_cache
+from latest_store import get_latest
+from metrics import registry, profiler, timed, REQUEST_SECONDS
 
 app = Flask(__name__)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+if profiler is not None:
+    profiler.start()
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def _record_request_latency(response):
+    start = g.get("request_start")
+    if start is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, status=response.status_code)
+    return response
+
+
+def update_data(on_stage=None):
+    """Download price data, format data, and train models for all catalog assets concurrently."""
+    # The update pipeline pulls in the downloaders and training stack, which
+    # inference-only workers never need, so import it on first use
+    from update_pipeline import run_pipeline
 
-def update_data():
-    """Download price data, format data, and train model."""
     logging.info("Starting data update process.")
     try:
-        # Update Binance data
-        logging.info("Updating Binance data...")
-        download_binance_data()
-        format_binance_data()
-        binance_data_path = os.path.join(data_base_path, "eth_price_data.csv")
-        if os.path.exists(binance_data_path):
-            df = pd.read_csv(binance_data_path)
-            logging.info(f"Binance data: {df.head()}")
-            train_model(binance_data_path, model_file_path)
-            logging.info(f"Binance data file found and model trained at {datetime.now()}")
-        else:
-            logging.error("Binance data file not found after download.")
-
-        # Update CoinGecko data
-        logging.info("Updating CoinGecko data...")
-        download_coingecko_data()
-        coingecko_data_path = os.path.join(data_base_path, "coingecko_eth_price_data.csv")
-        if os.path.exists(coingecko_data_path):
-            df = pd.read_csv(coingecko_data_path)
-            logging.info(f"CoinGecko data: {df.head()}")
-            train_model(coingecko_data_path, os.path.join(data_base_path, "eth_model.pkl"))
-            logging.info(f"CoinGecko data file found and model trained at {datetime.now()}")
-        else:
-            logging.error("CoinGecko data file not found after download.")
-
-        # Update CoinMarketCap data
-        logging.info("Updating CoinMarketCap data...")
-        download_cmc_data()
-        cmc_data_path = os.path.join(data_base_path, "cmc_eth_price_data.csv")
-        if os.path.exists(cmc_data_path):
-            df = pd.read_csv(cmc_data_path)
-            logging.info(f"CoinMarketCap data: {df.head()}")
-            train_model(cmc_data_path, os.path.join(data_base_path, "cmc_model.pkl"))
-            logging.info(f"CoinMarketCap data file found and model trained at {datetime.now()}")
-        else:
-            logging.error("CoinMarketCap data file not found after download.")
-
-        # Update Portals.fi data
-        logging.info("Updating Portals.fi data...")
-        download_portalsfi_data()
-        portalsfi_data_path = os.path.join(data_base_path, "portalsfi_eth_price_data.csv")
-        if os.path.exists(portalsfi_data_path):
-            df = pd.read_csv(portalsfi_data_path)
-            logging.info(f"Portals.fi data: {df.head()}")
-            train_model(portalsfi_data_path, os.path.join(data_base_path, "portalsfi_model.pkl"))
-            logging.info(f"Portals.fi data file found and model trained at {datetime.now()}")
-        else:
-            logging.error("Portals.fi data file not found after download.")
-
-        logging.info("Data update process completed successfully.")
+        report = run_pipeline(on_stage=on_stage)
     except Exception as e:
         logging.error(f"Data update process failed: {e}")
+        raise
+    for source, entry in report["sources"].items():
+        if entry["status"] == "ok":
+            logging.info(f"{source} model trained at {datetime.now()}, latest data: {get_latest(catalog[source]['data_path'])}")
+        else:
+            logging.error(f"{source} update {entry['status']}: {entry['error']}")
+    if shared_snapshot_enabled:
+        # One copy of every model, mapped by all server workers
+        publish_catalog(catalog)
+    model_registry.invalidate()
+    prediction_cache.invalidate()
+    for source, entry in report["sources"].items():
+        if entry["status"] == "ok":
+            precompute_predictions(source)
+    logging.info(f"Data update process completed in {report['seconds']}s.")
+    return report
 
-def get_eth_inference(data_source='binance'):
-    """Load ETH model and predict current price."""
-    model_path_map = {
-        'binance': model_file_path,
-        'coingecko': os.path.join(data_base_path, "eth_model.pkl"),
-        'cmc': os.path.join(data_base_path, "cmc_model.pkl"),
-        'portalsfi': os.path.join(data_base_path, "portalsfi_model.pkl")
-    }
-
-    data_path_map = {
-        'binance': os.path.join(data_base_path, "eth_price_data.csv"),
-        'coingecko': os.path.join(data_base_path, "coingecko_eth_price_data.csv"),
-        'cmc': os.path.join(data_base_path, "cmc_eth_price_data.csv"),
-        'portalsfi': os.path.join(data_base_path, "portalsfi_eth_price_data.csv")
-    }
-
-    if data_source not in model_path_map:
-        raise ValueError(f"Data source '{data_source}' not supported")
-
+def predict_prices(asset_key, timestamps, check=True):
+    """Predict an asset's prices for an array of epoch timestamps with one vectorized predict call."""
+    loaded_model = model_registry.get_with_version(asset_key, check)[1]
     try:
-        with open(model_path_map[data_source], "rb") as f:
-            loaded_model = pickle.load(f)
-            logging.info(f"Loaded model for {data_source} successfully at {datetime.now()}")
-    except FileNotFoundError:
-        logging.error(f"Model file for {data_source} not found.")
+        with timed("predict_batch", asset_key):
+            return np.asarray(loaded_model.predict(np.asarray(timestamps, dtype=float)), dtype=float).reshape(-1)
+    except Exception as e:
+        logging.error(f"Prediction error for {asset_key}: {e}")
         raise
 
+def precompute_predictions(asset_key):
+    """Fill the prediction cache for the upcoming time buckets of a freshly trained model."""
+    try:
+        version, loaded_model = model_registry.get_with_version(asset_key)
+        now_timestamp = pd.Timestamp(datetime.now()).timestamp()
+        n_buckets = prediction_cache.precompute(
+            asset_key, version, loaded_model.predict, now_timestamp, prediction_precompute_buckets
+        )
+        logging.info(f"Precomputed {n_buckets} predictions for {asset_key}")
+    except Exception as e:
+        logging.error(f"Precomputing predictions for {asset_key} failed: {e}")
+
+def get_inference(asset_key, check=True):
+    """
+    Predict an asset's current price with its in-memory model, cached per time
+    bucket. With check=False the model is not re-checked on disk.
+    """
+    version, loaded_model = model_registry.get_with_version(asset_key, check)
     now_timestamp = pd.Timestamp(datetime.now()).timestamp()
-    X_new = np.array([now_timestamp]).reshape(-1, 1)
-    
+
+    def predict(timestamp):
+        with timed("predict", asset_key):
+            return loaded_model.predict_one(timestamp)
+
     try:
-        current_price_pred = loaded_model.predict(X_new)
-        logging.info(f"Generated inference: {current_price_pred[0][0]} for source {data_source} at {datetime.now()}")
-        return current_price_pred[0][0]
+        current_price_pred = prediction_cache.get_or_compute(asset_key, version, now_timestamp, predict)
     except Exception as e:
-        logging.error(f"Prediction error for {data_source}: {e}")
+        logging.error(f"Prediction error for {asset_key}: {e}")
         raise
+    logging.info(f"Generated inference: {current_price_pred} for {asset_key} at {datetime.now()}")
+    return current_price_pred
 
-@app.route("/inference/<string:token>")
-def generate_inference(token):
-    """Generate inference for given token."""
-    logging.info(f"Received inference request for token: {token} at {datetime.now()}")
-    data_source = request.args.get('source', default='binance', type=str)
-    
-    if token.upper() == "ETH":
+def _parse_timestamps(payload):
+    """
+    Return the epoch timestamps requested in a batch payload: explicit
+    "timestamps" (epoch seconds or ISO strings) and/or "horizons" in seconds
+    from now. Defaults to now.
+    """
+    timestamps = []
+    for value in payload.get("timestamps") or []:
+        if isinstance(value, (int, float)):
+            timestamps.append(float(value))
+        else:
+            timestamps.append(pd.Timestamp(value).timestamp())
+    horizons = payload.get("horizons") or []
+    if horizons or not timestamps:
+        now_timestamp = pd.Timestamp(datetime.now()).timestamp()
+        timestamps.extend(now_timestamp + np.asarray(horizons or [0], dtype=float))
+    return np.asarray(timestamps, dtype=float)
+
+def inference_result(token, data_source=None, interval=None, check=True):
+    """
+    Return (status code, body, mimetype) of an inference request for a token;
+    shared by the Flask route and the ASGI fast path. With check=False nothing
+    is read from disk.
+    """
+    try:
+        asset = find_asset(token, data_source, interval)
+    except ValueError as e:
+        logging.error(f"Inference request failed: {e} at {datetime.now()}")
+        return 400, json.dumps({"error": str(e)}), 'application/json'
+
+    try:
+        if check:
+            logging.info(f"Latest data for {asset['key']}: {get_latest(asset['data_path'])}")
+        inference = get_inference(asset["key"], check)
+        logging.info(f"Inference for {asset['key']} successfully generated at {datetime.now()}")
+        return 200, str(inference), 'text/html'
+    except Exception as e:
+        logging.error(f"Inference generation failed: {e}")
+        return 500, json.dumps({"error": str(e)}), 'application/json'
+
+def _is_list_of(value, types):
+    return isinstance(value, list) and all(isinstance(item, types) and not isinstance(item, bool) for item in value)
+
+def batch_inference_result(payload, check=True):
+    """Return (status code, JSON-serializable body) of a batch inference request."""
+    if not isinstance(payload, dict):
+        return 400, {"error": "request body must be a JSON object"}
+    token = str(payload.get("token", "ETH")).upper()
+    interval = payload.get("interval")
+    if interval is not None and not isinstance(interval, str):
+        return 400, {"error": "interval must be a string"}
+    try:
+        default_asset = find_asset(token, interval=interval)
+    except ValueError as e:
+        return 400, {"error": str(e)}
+
+    sources = payload.get("sources") or [default_asset["source"]]
+    if not _is_list_of(sources, str):
+        return 400, {"error": "sources must be a list of source names"}
+    if not _is_list_of(payload.get("timestamps") or [], (int, float, str)):
+        return 400, {"error": "timestamps must be a list of epoch seconds or ISO dates"}
+    if not _is_list_of(payload.get("horizons") or [], (int, float)):
+        return 400, {"error": "horizons must be a list of seconds"}
+    try:
+        timestamps = _parse_timestamps(payload)
+    except (TypeError, ValueError) as e:
+        return 400, {"error": f"Invalid timestamps: {e}"}
+    logging.info(f"Received batch inference request for {token}: {len(sources)} sources x {len(timestamps)} timestamps")
+
+    results = {}
+    for data_source in sources:
         try:
-            # Read the latest data to log details
-            data_path_map = {
-                'binance': os.path.join(data_base_path, "eth_price_data.csv"),
-                'coingecko': os.path.join(data_base_path, "coingecko_eth_price_data.csv"),
-                'cmc': os.path.join(data_base_path, "cmc_eth_price_data.csv"),
-                'portalsfi': os.path.join(data_base_path, "portalsfi_eth_price_data.csv")
+            asset = find_asset(token, data_source, interval)
+            predictions = predict_prices(asset["key"], timestamps, check)
+            results[data_source] = {
+                "asset": asset["key"], "timestamps": timestamps.tolist(), "predictions": predictions.tolist(),
             }
-            
-            if data_source in data_path_map:
-                df = pd.read_csv(data_path_map[data_source])
-                latest_data = df.tail(1)
-                logging.info(f"Latest data from {data_source}: {latest_data.to_dict(orient='records')}")
-
-            inference = get_eth_inference(data_source)
-            logging.info(f"Inference for ETH from {data_source} successfully generated at {datetime.now()}")
-            return Response(str(inference), status=200)
         except Exception as e:
-            logging.error(f"Inference generation failed: {e}")
-            return Response(json.dumps({"error": str(e)}), status=500, mimetype='application/json')
-    else:
-        error_msg = "Token is required" if not token else "Token not supported"
-        logging.error(f"Inference request failed: {error_msg} at {datetime.now()}")
-        return Response(json.dumps({"error": error_msg}), status=400, mimetype='application/json')
+            logging.error(f"Batch inference for {token} from {data_source} failed: {e}")
+            results[data_source] = {"error": str(e)}
+    return 200, {"token": token, "results": results}
+
+@app.route("/inference/<string:token>")
+def generate_inference(token):
+    """Generate inference for given token, optionally for a ?source= and ?interval= from the asset catalog."""
+    logging.info(f"Received inference request for token: {token} at {datetime.now()}")
+    data_source = request.args.get('source', default=None, type=str)
+    interval = request.args.get('interval', default=None, type=str)
+    status, body, mimetype = inference_result(token, data_source, interval)
+    return Response(body, status=status, mimetype=mimetype)
+
+@app.route("/inference/batch", methods=["POST"])
+def generate_batch_inference():
+    """Generate inferences for many sources and timestamps of a token in one request."""
+    payload = request.get_json(silent=True)
+    if payload is None and request.get_data():
+        return jsonify({"error": "request body must be valid JSON"}), 400
+    status, body = batch_inference_result({} if payload is None else payload)
+    return jsonify(body), status
+
+def trigger_update():
+    """Start an update job in the background unless one is running; returns (job_id, started)."""
+    from update_pipeline import stage_count
+
+    job_id, started = update_coordinator.trigger(update_data, total_stages=stage_count())
+    if started:
+        logging.info(f"Update process {job_id} started at {datetime.now()}")
+    return job_id, started
 
 @app.route("/update", methods=["GET"])
 def update():
-    """Update data and return status."""
+    """Start an update, or join the one already running, and return its job id."""
     try:
-        thread = threading.Thread(target=update_data)
-        thread.start()
-        logging.info(f"Update process started at {datetime.now()}")
-        return Response(json.dumps({"status": "update started"}), status=200, mimetype='application/json')
+        job_id, started = trigger_update()
+        status = "update started" if started else "update already running"
+        return Response(json.dumps({"status": status, "job_id": job_id}), status=200, mimetype='application/json')
     except Exception as e:
         logging.error(f"Failed to start update process: {e}")
         return Response(json.dumps({"error": str(e)}), status=500, mimetype='application/json')
 
+@app.route("/update/status")
+def update_status():
+    """Return the current or last update job with its progress and per-source timings."""
+    return jsonify(update_coordinator.read_status())
+
 @app.route("/status")
 def status():
-    """Return status of the model and data."""
-    try:
-        with open(model_file_path, "rb") as f:
-            loaded_model = pickle.load(f)
-            logging.info(f"Model loaded successfully at {datetime.now()}")
-        return jsonify({"status": "Model loaded successfully"})
-    except Exception as e:
-        logging.error(f"Status check failed: {e}")
-        return Response(json.dumps({"error": str(e)}), status=500, mimetype='application/json')
+    """Return status of the models of all catalog assets; fails only if none can be loaded."""
+    models = {}
+    for asset_key in catalog:
+        try:
+            model_registry.get(asset_key)
+            models[asset_key] = "loaded"
+        except Exception as e:
+            logging.error(f"Status check for {asset_key} failed: {e}")
+            models[asset_key] = f"error: {e}"
+    if "loaded" not in models.values():
+        return Response(json.dumps({"error": "No model loaded", "models": models}), status=500, mimetype='application/json')
+    return jsonify({"status": "Model loaded successfully", "models": models})
+
+@app.route("/metrics")
+def metrics():
+    """Return this worker's latency histograms and counters in the Prometheus text format."""
+    return Response(registry.render(), status=200, mimetype="text/plain; version=0.0.4")
+
+@app.route("/profile")
+def profile():
+    """Return the sampling profiler's folded stacks; enabled with PROFILE_SAMPLE_INTERVAL."""
+    if profiler is None:
+        return Response(json.dumps({"error": "Profiler disabled, set PROFILE_SAMPLE_INTERVAL"}), status=404,
+                        mimetype='application/json')
+    limit = request.args.get("limit", default=None, type=int)
+    return Response(profiler.folded(limit), status=200, mimetype="text/plain")
 
 if __name__ == "__main__":
     update_data()
@@ -0,0 +1,160 @@
+"""
+ASGI entry point for serving under an async worker model.
+
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn --conf gunicorn_conf.py asgi:app
+
+Inference requests are answered on the event loop from the models already in
+memory. The models are loaded when the worker starts, and a background task
+re-checks the model snapshot and files in a thread, so requests never wait on
+disk. Requests for a model that is not in memory yet, or whose predict is
+expensive (Chronos), run in a thread instead. Every other route (/update,
+/status, /metrics, ...) is served by the Flask app in a thread pool.
+"""
+import json
+import time
+import asyncio
+import logging
+from urllib.parse import parse_qs
+from asgiref.wsgi import WsgiToAsgi
+from config import model_reload_interval
+from app import app as flask_app, inference_result, batch_inference_result
+from assets import find_asset
+from model_registry import model_registry
+from metrics import REQUEST_SECONDS
+
+# Largest batch request body accepted, in bytes
+MAX_BODY_BYTES = 1 << 20
+
+INFERENCE_PREFIX = "/inference/"
+
+wsgi_app = WsgiToAsgi(flask_app)
+
+
+async def _refresh_models():
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(model_reload_interval)
+        try:
+            await loop.run_in_executor(None, model_registry.refresh)
+        except Exception as e:
+            logging.error(f"Background model refresh failed: {e}")
+
+
+def _load_models():
+    """Attach the model snapshot and load every asset's model, so requests find them in memory."""
+    for source in model_registry.sources():
+        try:
+            model_registry.get(source)
+        except Exception as e:
+            logging.warning(f"Model for {source} not loaded at start-up: {e}")
+
+
+def _inline(token, data_sources, interval):
+    """
+    Whether an inference for these sources can run on the event loop: their
+    models are in memory and cheap to evaluate. Requests that fail validation
+    are answered inline too; they never reach a model.
+    """
+    for data_source in data_sources:
+        try:
+            asset = find_asset(token, data_source, interval)
+        except (ValueError, TypeError):
+            continue
+        if not model_registry.in_memory(asset["key"]):
+            return False
+        if not model_registry.get_with_version(asset["key"], check=False)[1].fast_predict:
+            return False
+    return True
+
+
+async def _lifespan(receive, send):
+    refresher = None
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, _load_models)
+            refresher = loop.create_task(_refresh_models())
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if refresher is not None:
+                refresher.cancel()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def _respond(send, status, body, content_type):
+    body = body.encode()
+    if content_type.startswith("text/"):
+        content_type += "; charset=utf-8"
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY_BYTES:
+            raise ValueError("Request body too large")
+        if not message.get("more_body"):
+            return body
+
+
+async def _inference(scope, send, token):
+    query = parse_qs(scope["query_string"].decode())
+    data_source = query.get("source", [None])[0]
+    interval = query.get("interval", [None])[0]
+    logging.info(f"Received inference request for token: {token}")
+    if _inline(token, [data_source], interval):
+        status, body, content_type = inference_result(token, data_source, interval, check=False)
+    else:
+        status, body, content_type = await asyncio.to_thread(inference_result, token, data_source, interval, False)
+    await _respond(send, status, body, content_type)
+    return status
+
+
+async def _batch_inference(receive, send):
+    try:
+        body = await _read_body(receive)
+    except ValueError as e:
+        await _respond(send, 413, json.dumps({"error": str(e)}), "application/json")
+        return 413
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        await _respond(send, 400, json.dumps({"error": "request body must be valid JSON"}), "application/json")
+        return 400
+    sources = (payload.get("sources") or [None]) if isinstance(payload, dict) else None
+    if not isinstance(sources, list) or _inline(str(payload.get("token", "ETH")).upper(), sources, payload.get("interval")):
+        status, body = batch_inference_result(payload, check=False)
+    else:
+        status, body = await asyncio.to_thread(batch_inference_result, payload, False)
+    await _respond(send, status, json.dumps(body), "application/json")
+    return status
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+
+    if scope["type"] == "http":
+        path = scope["path"]
+        start = time.perf_counter()
+        if path == "/inference/batch" and scope["method"] == "POST":
+            status = await _batch_inference(receive, send)
+            REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint="/inference/batch", status=status)
+            return
+        token = path[len(INFERENCE_PREFIX):] if path.startswith(INFERENCE_PREFIX) else ""
+        if token and "/" not in token and scope["method"] == "GET":
+            status = await _inference(scope, send, token)
+            REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint="/inference/<string:token>", status=status)
+            return
+
+    await wsgi_app(scope, receive, send)
@@ -0,0 +1,112 @@
+import os
+import json
+from config import data_base_path, default_asset_catalog, asset_catalog_path
+from aggregates import check_resolution
+
+# Data sources with a plugin in sources.py
+SOURCES = ("binance", "coingecko", "cmc", "portalsfi")
+
+
+def asset_key(token, source, interval):
+    """Return the key an asset is registered under, e.g. "ETH/binance/1d"."""
+    return f"{token.upper()}/{source}/{interval}"
+
+
+def _data_path(asset_dir, source, interval):
+    return os.path.join(asset_dir, f"{source}_{interval}_price_data.csv")
+
+
+def _make_asset(entry):
+    """Validate one catalog entry and add its key and per-asset storage paths."""
+    token = str(entry["token"]).upper()
+    source = entry["source"]
+    interval = entry.get("interval", "1d")
+    if source not in SOURCES:
+        raise ValueError(f"Data source '{source}' of {token} not supported")
+    if source == "binance" and not entry.get("listing_date") and not entry.get("aggregate_from"):
+        raise ValueError(f"Binance asset {token}/{interval} needs a listing_date")
+
+    asset_dir = os.path.join(data_base_path, token.lower())
+    asset = dict(
+        entry,
+        token=token,
+        source=source,
+        interval=interval,
+        symbol=entry.get("symbol") or token,
+        key=asset_key(token, source, interval),
+        data_path=_data_path(asset_dir, source, interval),
+        model_path=os.path.join(asset_dir, f"{source}_{interval}_model.json"),
+    )
+    if entry.get("aggregate_from"):
+        # Bars derived from the base interval's price store instead of downloaded
+        if source != "binance":
+            raise ValueError(f"Only Binance klines can be aggregated, not {asset['key']}")
+        check_resolution(entry["aggregate_from"], interval)
+        asset["base_key"] = asset_key(token, source, entry["aggregate_from"])
+        asset["base_data_path"] = _data_path(asset_dir, source, entry["aggregate_from"])
+    elif source == "binance":
+        asset.setdefault("market", "um")
+        asset["archive_path"] = os.path.join(data_base_path, "binance", "futures-klines", asset["symbol"], interval)
+    return asset
+
+
+def _expand_resolutions(entry):
+    """Yield the entry and, for its `resolutions`, one derived entry per resolution."""
+    yield {name: value for name, value in entry.items() if name != "resolutions"}
+    for resolution in entry.get("resolutions", ()):
+        derived = {name: value for name, value in entry.items() if name not in ("resolutions", "listing_date")}
+        yield dict(derived, interval=resolution, aggregate_from=entry.get("interval", "1d"))
+
+
+def load_catalog(path=None):
+    """
+    Load the asset catalog from a JSON file (a list of entries), or the
+    built-in default catalog when no path is given. A Binance entry with
+    `resolutions` (e.g. 1m with ["1h", "4h", "1d", "1w"]) adds one asset per
+    resolution aggregated from it. Returns the assets keyed by asset key, in
+    catalog order.
+    """
+    entries = default_asset_catalog
+    if path:
+        with open(path) as f:
+            entries = json.load(f)
+
+    catalog = {}
+    for entry in entries:
+        for expanded in _expand_resolutions(entry):
+            asset = _make_asset(expanded)
+            if asset["key"] in catalog:
+                raise ValueError(f"Duplicate asset {asset['key']} in catalog")
+            catalog[asset["key"]] = asset
+    for asset in catalog.values():
+        if "base_key" in asset and asset["base_key"] not in catalog:
+            raise ValueError(f"{asset['key']} is aggregated from {asset['base_key']}, which is not in the catalog")
+    return catalog
+
+
+def derived_assets(base_key):
+    """Return the catalog assets aggregated from the given base asset."""
+    return [asset for asset in catalog.values() if asset.get("base_key") == base_key]
+
+
+catalog = load_catalog(asset_catalog_path)
+
+
+def tokens():
+    """Return the tokens in the catalog."""
+    return sorted({asset["token"] for asset in catalog.values()})
+
+
+def find_asset(token, source=None, interval=None):
+    """
+    Return the catalog entry for a token. Source and interval are optional
+    filters; the first matching entry in catalog order is returned.
+    """
+    token = str(token).upper()
+    for asset in catalog.values():
+        if asset["token"] == token and source in (None, asset["source"]) and interval in (None, asset["interval"]):
+            return asset
+    if not any(asset["token"] == token for asset in catalog.values()):
+        raise ValueError(f"Token '{token}' not supported")
+    wanted = ", ".join(f"{name} '{value}'" for name, value in (("source", source), ("interval", interval)) if value)
+    raise ValueError(f"No {token} asset with {wanted}")
@@ -0,0 +1,494 @@
+import os
+import json
+import time
+import logging
+import importlib
+import threading
+import numpy as np
+from config import model_type
+from metrics import timed
+from features import (
+    build_features, training_matrix, time_feature, epoch_seconds, price_column, FeatureState,
+    HISTORY, TIME_ORIGIN, SECONDS_PER_YEAR,
+)
+
+# Identifies model artifacts written by ModelBackend.save; bump the version on incompatible changes
+MODEL_FORMAT = "eth-price-model"
+MODEL_FORMAT_VERSION = 1
+
+# Fewer complete feature rows than this trains the linear model on the time feature alone
+MIN_TRAINING_ROWS = 10
+# Share of the most recent rows held out to report the linear model error
+HOLDOUT_FRACTION = 0.2
+# Incremental updates with up to this many new candles compute their features one candle at a
+# time with FeatureState; larger batches (e.g. after downtime) use the vectorized build_features
+FEATURE_STATE_MAX_ROWS = 512
+
+# Third-party modules each model type needs. They are imported the first time
+# a model of that type is trained or loaded, never at server start-up.
+BACKEND_MODULES = {
+    "linear": [],
+    "chronos": ["torch", "chronos"],
+}
+
+# Requirements file that installs each model type's modules
+BACKEND_REQUIREMENTS = {
+    "linear": "requirements.txt",
+    "chronos": "requirements-chronos.txt",
+}
+
+_modules = {}
+_lock = threading.Lock()
+
+
+def import_backend_modules(name=None):
+    """
+    Import and return the modules required by a model type (the configured
+    MODEL_TYPE by default), keyed by module name.
+    """
+    name = name or model_type
+    if name not in BACKEND_MODULES:
+        raise ValueError(f"Model type '{name}' not supported")
+    with _lock:
+        modules = {}
+        for module_name in BACKEND_MODULES[name]:
+            if module_name not in _modules:
+                start = time.perf_counter()
+                try:
+                    _modules[module_name] = importlib.import_module(module_name)
+                except ImportError as e:
+                    raise ImportError(
+                        f"Model type '{name}' requires '{module_name}', install it with "
+                        f"pip install -r {BACKEND_REQUIREMENTS[name]}"
+                    ) from e
+                logging.info(f"Imported {module_name} for {name} models in {time.perf_counter() - start:.2f}s")
+            modules[module_name] = _modules[module_name]
+        return modules
+
+
+class OnlineLinearRegression:
+    """
+    Linear least squares fitted from accumulated sufficient statistics.
+
+    X^T X and X^T y (with an intercept column) are kept with the model, so
+    partial_fit with only the new rows gives the same coefficients as a full
+    refit on all rows seen so far, in O(new rows x features^2).
+    """
+
+    def __init__(self, ridge=1e-10):
+        self.ridge = ridge
+        self.xtx = None
+        self.xty = None
+        self.n_samples = 0
+        self.coef_ = None
+        self.intercept_ = 0.0
+
+    def fit(self, X, y):
+        self.xtx = None
+        self.xty = None
+        self.n_samples = 0
+        return self.partial_fit(X, y)
+
+    def partial_fit(self, X, y):
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float).reshape(-1)
+        design = np.hstack([np.ones((len(X), 1)), X])
+        if self.xtx is None:
+            self.xtx = np.zeros((design.shape[1], design.shape[1]))
+            self.xty = np.zeros(design.shape[1])
+        self.xtx += design.T @ design
+        self.xty += design.T @ y
+        self.n_samples += len(X)
+        self._solve()
+        return self
+
+    def _solve(self):
+        # A tiny ridge term keeps the system solvable with collinear or constant features
+        penalty = self.ridge * max(np.trace(self.xtx) / len(self.xtx), 1.0) * np.eye(len(self.xtx))
+        penalty[0, 0] = 0.0
+        weights = np.linalg.lstsq(self.xtx + penalty, self.xty, rcond=None)[0]
+        self.intercept_ = weights[0]
+        self.coef_ = weights[1:]
+
+    def predict(self, X):
+        return np.asarray(X, dtype=float) @ self.coef_ + self.intercept_
+
+    def to_dict(self):
+        return {
+            "ridge": self.ridge,
+            "n_samples": self.n_samples,
+            "coef": self.coef_.tolist(),
+            "intercept": float(self.intercept_),
+            "xtx": self.xtx.tolist(),
+            "xty": self.xty.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        estimator = cls(ridge=data["ridge"])
+        estimator.n_samples = data["n_samples"]
+        estimator.coef_ = np.asarray(data["coef"], dtype=float)
+        estimator.intercept_ = data["intercept"]
+        estimator.xtx = np.asarray(data["xtx"], dtype=float)
+        estimator.xty = np.asarray(data["xty"], dtype=float)
+        return estimator
+
+
+class LastPriceModel:
+    """Naive baseline predicting the latest close; expects "close" as feature column 1."""
+
+    def fit(self, X, y):
+        return self
+
+    def predict(self, X):
+        return np.asarray(X, dtype=float)[:, 1]
+
+
+def _sklearn_estimator(class_name, **params):
+    def factory():
+        linear_model = importlib.import_module("sklearn.linear_model")
+        return getattr(linear_model, class_name)(**params)
+    return factory
+
+
+# Estimators that can be trained and backtested on the feature matrix, by model type
+ESTIMATORS = {
+    "linear": OnlineLinearRegression,
+    "ridge": _sklearn_estimator("Ridge", alpha=1.0),
+    "last_price": LastPriceModel,
+}
+
+
+def create_estimator(name):
+    if name not in ESTIMATORS:
+        raise ValueError(f"Model type '{name}' not supported, choose from {sorted(ESTIMATORS)}")
+    return ESTIMATORS[name]()
+
+
+class ModelBackend:
+    """
+    Interface of a trainable price model stored as a versioned JSON artifact.
+
+    Backends implement fit(price_data), predict(timestamps), to_dict() and
+    from_dict(data); update(price_data) may return None to ask for a full fit.
+    """
+
+    name = None
+    # Whether predict is cheap enough to run on an async server's event loop
+    fast_predict = False
+
+    def __init__(self):
+        self.updates_since_refit = 0
+
+    def fit(self, price_data, previous=None):
+        """Train on price_data; previous is the model being replaced, if any."""
+        raise NotImplementedError
+
+    def update(self, price_data):
+        """Fold new rows into the model; returns the number of new rows, or None when unsupported."""
+        return None
+
+    def predict(self, timestamps):
+        """Predict prices for an array of epoch timestamps (seconds)."""
+        raise NotImplementedError
+
+    def predict_one(self, timestamp):
+        return float(self.predict([timestamp])[0])
+
+    @property
+    def n_samples(self):
+        return 0
+
+    def to_dict(self):
+        raise NotImplementedError
+
+    @classmethod
+    def from_dict(cls, data):
+        raise NotImplementedError
+
+    def to_artifact(self):
+        """Return the versioned artifact dict that save() writes and model_from_artifact() reads."""
+        artifact = {"format": MODEL_FORMAT, "version": MODEL_FORMAT_VERSION, "backend": self.name}
+        artifact.update(self.to_dict())
+        artifact["updates_since_refit"] = self.updates_since_refit
+        return artifact
+
+    def save(self, path):
+        """Write the model artifact to a temporary file and rename it into place."""
+        artifact = self.to_artifact()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(artifact, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+
+class LinearBackend(ModelBackend):
+    """
+    Linear model on the feature row of the latest candle plus the target time.
+
+    All features except time are fixed at the latest candle, so prediction
+    collapses to base + slope * t; predict_one is two float operations with no
+    array allocation.
+    """
+
+    name = "linear"
+    fast_predict = True
+
+    def __init__(self, estimator=None, feature_names=(), last_features=(), last_trained_t=None):
+        super().__init__()
+        self.estimator = estimator
+        self.feature_names = list(feature_names)
+        self.last_features = np.asarray(last_features, dtype=float)
+        # Time feature of the newest training target, the cut-off for incremental updates
+        self.last_trained_t = last_trained_t
+        self._prepare()
+
+    def _prepare(self):
+        if self.estimator is None or self.estimator.coef_ is None:
+            self._base, self._slope = 0.0, 0.0
+            return
+        coef = self.estimator.coef_
+        self._slope = float(coef[0]) / SECONDS_PER_YEAR
+        self._base = float(self.estimator.intercept_ + coef[1:] @ self.last_features[1:]) - self._slope * TIME_ORIGIN
+
+    @property
+    def n_samples(self):
+        return self.estimator.n_samples if self.estimator is not None else 0
+
+    def feature_rows(self, timestamps):
+        timestamps = np.asarray(timestamps, dtype=float).reshape(-1)
+        rows = np.repeat(self.last_features[None, :], len(timestamps), axis=0)
+        rows[:, 0] = time_feature(timestamps)
+        return rows
+
+    @staticmethod
+    def training_data(price_data, feature_set=None):
+        """
+        Return (x, y, target_times, feature_names, last_features) for a price frame.
+
+        Uses the full feature set when there are enough complete rows (or when
+        feature_set asks for it) and the time feature alone otherwise. Target
+        times are in time-feature units.
+        """
+        if feature_set != ["t"]:
+            features = build_features(price_data)
+            x, y, target_times = training_matrix(features)
+            if feature_set is not None or len(y) >= MIN_TRAINING_ROWS:
+                return x, y, target_times, list(features.columns), features.iloc[-1].to_numpy(dtype=float)
+
+        x = time_feature(epoch_seconds(price_data["date"])).reshape(-1, 1)
+        y = np.asarray(price_data[price_column(price_data.columns)], dtype=float)
+        return x, y, x[:, 0], ["t"], x[-1]
+
+    def fit(self, price_data, previous=None):
+        x, y, target_times, names, last_features = self.training_data(price_data)
+        if names == ["t"]:
+            logging.warning("Too few complete feature rows, training on the time feature alone.")
+
+        # Report the error on the most recent rows before fitting on the full history
+        n_holdout = int(len(y) * HOLDOUT_FRACTION)
+        if n_holdout:
+            holdout_model = OnlineLinearRegression().fit(x[:-n_holdout], y[:-n_holdout])
+            mae = np.abs(holdout_model.predict(x[-n_holdout:]) - y[-n_holdout:]).mean()
+            logging.info(f"Holdout MAE on the last {n_holdout} rows: {mae:.4f}")
+
+        self.estimator = OnlineLinearRegression().fit(x, y)
+        self.feature_names = names
+        self.last_features = last_features
+        self.last_trained_t = float(target_times[-1])
+        self.updates_since_refit = 0
+        self._prepare()
+
+        if isinstance(previous, LinearBackend) and previous.feature_names == names:
+            # Drift check: how far the previous (incrementally updated) model is from the refit
+            drift = np.abs(previous.estimator.predict(x) - self.estimator.predict(x)).mean()
+            logging.info(f"Full refit: mean prediction change vs previous model {drift:.4f}")
+        return self
+
+    def update(self, price_data):
+        """
+        Update the model with only the rows newer than its last training target.
+        Small batches, e.g. streamed candles, get their features from a
+        FeatureState in O(window) per candle. Returns the number of new rows
+        (0 leaves the model untouched), or None if a full refit is needed (also
+        when price_data starts after the last training target).
+        """
+        if self.estimator is None or self.last_trained_t is None:
+            return None
+
+        # Only the new rows plus enough history to compute their features are needed
+        dates = time_feature(epoch_seconds(price_data["date"]))
+        first_new = int(np.searchsorted(dates, self.last_trained_t, side="right"))
+        if first_new == 0:
+            # The frame does not reach back to the last training target
+            return None
+
+        if self.feature_names != ["t"] and len(dates) - first_new <= FEATURE_STATE_MAX_ROWS:
+            streamed = self._streamed_rows(price_data, first_new)
+            if streamed is None:
+                return None
+            x, y, last_features = streamed
+            target_times = x[:, 0]
+            new = np.ones(len(y), dtype=bool)
+        else:
+            tail = price_data.iloc[max(0, first_new - HISTORY - 1):]
+            x, y, target_times, names, last_features = self.training_data(tail, self.feature_names)
+            if names != self.feature_names:
+                return None
+            new = target_times > self.last_trained_t
+
+        if not new.any():
+            return 0
+        self.estimator.partial_fit(x[new], y[new])
+        self.last_trained_t = float(target_times[new][-1])
+        self.last_features = last_features
+        self.updates_since_refit += 1
+        self._prepare()
+        return int(new.sum())
+
+    def _streamed_rows(self, price_data, first_new):
+        """
+        Training rows (x, y) for the candles from first_new on, computed one
+        candle at a time with a FeatureState seeded from the rows before them,
+        plus the feature row of the last candle. None if the features differ.
+        """
+        state = FeatureState.from_frame(price_data.iloc[max(0, first_new - HISTORY):first_new])
+        if state.names != self.feature_names:
+            return None
+        close = state.names.index("close")
+        previous = state.current()
+        x, y = [], []
+        for candle in price_data.iloc[first_new:].to_dict(orient="records"):
+            row = state.update(candle)
+            # As in training_matrix: the previous candle's features at this candle's time predict its close
+            sample = previous.copy()
+            sample[0] = row[0]
+            if np.isfinite(sample).all() and np.isfinite(row[close]):
+                x.append(sample)
+                y.append(row[close])
+            previous = row
+        return np.asarray(x, dtype=float).reshape(-1, len(state.names)), np.asarray(y, dtype=float), previous
+
+    def predict(self, timestamps):
+        return self._base + self._slope * np.asarray(timestamps, dtype=float).reshape(-1)
+
+    def predict_one(self, timestamp):
+        return self._base + self._slope * timestamp
+
+    def to_dict(self):
+        return {
+            "feature_names": self.feature_names,
+            "last_features": self.last_features.tolist(),
+            "last_trained_t": self.last_trained_t,
+            "estimator": self.estimator.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            OnlineLinearRegression.from_dict(data["estimator"]),
+            data["feature_names"],
+            data["last_features"],
+            data["last_trained_t"],
+        )
+
+
+class ChronosBackend(ModelBackend):
+    """
+    Zero-shot Chronos forecaster over the latest closes.
+
+    Training only stores the context window; torch and chronos are imported,
+    and the pretrained pipeline loaded, on the first prediction.
+    """
+
+    name = "chronos"
+    CONTEXT_LENGTH = 512
+
+    def __init__(self, model_name="amazon/chronos-t5-small", context=(), last_time=None, interval_seconds=None):
+        super().__init__()
+        self.model_name = model_name
+        self.context = list(context)
+        self.last_time = last_time
+        self.interval_seconds = interval_seconds
+        self._pipeline = None
+        self._torch = None
+        self._lock = threading.Lock()
+
+    @property
+    def n_samples(self):
+        return len(self.context)
+
+    def fit(self, price_data, previous=None):
+        close = np.asarray(price_data[price_column(price_data.columns)], dtype=float)
+        times = epoch_seconds(price_data["date"].iloc[-self.CONTEXT_LENGTH:])
+        self.context = close[-self.CONTEXT_LENGTH:].tolist()
+        self.last_time = float(times[-1])
+        self.interval_seconds = float(np.median(np.diff(times))) if len(times) > 1 else 86400.0
+        return self
+
+    def _load_pipeline(self):
+        with self._lock:
+            if self._pipeline is None:
+                modules = import_backend_modules(self.name)
+                torch = modules["torch"]
+                self._pipeline = modules["chronos"].ChronosPipeline.from_pretrained(
+                    self.model_name, device_map="cpu", torch_dtype=torch.float32
+                )
+                self._torch = torch
+        return self._pipeline
+
+    def predict(self, timestamps):
+        pipeline = self._load_pipeline()
+        timestamps = np.asarray(timestamps, dtype=float).reshape(-1)
+        steps = np.maximum(1, np.ceil((timestamps - self.last_time) / self.interval_seconds)).astype(int)
+        forecast = pipeline.predict(self._torch.tensor(self.context), prediction_length=int(steps.max()))
+        median = np.median(forecast[0].numpy(), axis=0)
+        return median[steps - 1]
+
+    def to_dict(self):
+        return {
+            "model_name": self.model_name,
+            "context": self.context,
+            "last_time": self.last_time,
+            "interval_seconds": self.interval_seconds,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["model_name"], data["context"], data["last_time"], data["interval_seconds"])
+
+
+# Model backends by model type
+BACKENDS = {
+    "linear": LinearBackend,
+    "chronos": ChronosBackend,
+}
+
+
+def create_backend(name=None):
+    name = name or model_type
+    if name not in BACKENDS:
+        raise ValueError(f"Model type '{name}' not supported, choose from {sorted(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+def model_from_artifact(artifact, origin="artifact"):
+    """Build a model from an artifact dict; origin names its file in error messages."""
+    if artifact.get("format") != MODEL_FORMAT:
+        raise ValueError(f"{origin} is not a model artifact")
+    if artifact.get("version") != MODEL_FORMAT_VERSION:
+        raise ValueError(f"Unsupported model artifact version {artifact.get('version')} in {origin}")
+    if artifact.get("backend") not in BACKENDS:
+        raise ValueError(f"Model type '{artifact.get('backend')}' in {origin} not supported")
+    model = BACKENDS[artifact["backend"]].from_dict(artifact)
+    model.updates_since_refit = artifact.get("updates_since_refit", 0)
+    return model
+
+
+def load_model(path):
+    """Load a model artifact written by ModelBackend.save."""
+    with timed("load_model"):
+        with open(path) as f:
+            artifact = json.load(f)
+        return model_from_artifact(artifact, path)
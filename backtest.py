@@ -0,0 +1,171 @@
+"""
+Walk-forward backtesting of the registered model types on the consolidated price history.
+
+    python backtest.py --token ETH --source binance --models linear ridge last_price --folds 5
+"""
+import os
+import time
+import json
+import hashlib
+import argparse
+import logging
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from config import backtest_cache_path
+from assets import SOURCES, find_asset
+from features import build_features, training_matrix
+from backends import create_estimator, ESTIMATORS
+import price_store
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def walk_forward_folds(n_rows, n_folds, min_train_rows):
+    """
+    Split n_rows time-ordered rows into expanding-window folds.
+    Returns a list of (train_end, test_end): fold k trains on rows [0, train_end)
+    and tests on [train_end, test_end).
+    """
+    if n_rows <= min_train_rows:
+        raise ValueError(f"Need more than {min_train_rows} rows for a backtest, got {n_rows}")
+    test_size = max(1, (n_rows - min_train_rows) // n_folds)
+    folds = []
+    train_end = n_rows - test_size * n_folds
+    for _ in range(n_folds):
+        folds.append((train_end, min(train_end + test_size, n_rows)))
+        train_end += test_size
+    return folds
+
+
+def _store_version(data_path):
+    path = price_store.primary_path(data_path)
+    if not os.path.exists(path):
+        path = data_path
+    stat = os.stat(path)
+    return f"{path}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def prepare_folds(data_path, n_folds, min_train_rows, cache_dir=backtest_cache_path):
+    """
+    Build the feature matrix once and write each fold's train/test matrices to
+    an .npz cache keyed by the price store version and fold bounds. Cached
+    folds are reused across runs and model types. Returns the fold file paths.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    version = _store_version(data_path)
+    price_data = None
+    X = y = None
+    paths = []
+
+    # Row count is only known after building features; cache it per store version
+    meta_key = hashlib.sha1(f"{version}:rows".encode()).hexdigest()[:16]
+    meta_path = os.path.join(cache_dir, f"{meta_key}.json")
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            n_rows = json.load(f)["rows"]
+    else:
+        price_data = price_store.load_prices(data_path)
+        X, y, _ = training_matrix(build_features(price_data))
+        n_rows = len(y)
+        with open(meta_path, "w") as f:
+            json.dump({"rows": n_rows}, f)
+
+    for k, (train_end, test_end) in enumerate(walk_forward_folds(n_rows, n_folds, min_train_rows)):
+        key = hashlib.sha1(f"{version}:{train_end}:{test_end}".encode()).hexdigest()[:16]
+        path = os.path.join(cache_dir, f"{key}.npz")
+        if not os.path.exists(path):
+            if X is None:
+                price_data = price_store.load_prices(data_path)
+                X, y, _ = training_matrix(build_features(price_data))
+            tmp_path = f"{path}.tmp.npz"
+            np.savez(tmp_path, x_train=X[:train_end], y_train=y[:train_end],
+                     x_test=X[train_end:test_end], y_test=y[train_end:test_end])
+            os.replace(tmp_path, path)
+        paths.append(path)
+    return paths
+
+
+def run_fold(model_type, fold_path):
+    """Fit and evaluate one model type on one cached fold; returns error, latency and memory metrics."""
+    with np.load(fold_path) as fold:
+        x_train, y_train, x_test, y_test = fold["x_train"], fold["y_train"], fold["x_test"], fold["y_test"]
+
+    estimator = create_estimator(model_type)
+    tracemalloc.start()
+    start = time.perf_counter()
+    estimator.fit(x_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    predictions = np.asarray(estimator.predict(x_test), dtype=float).reshape(-1)
+    predict_seconds = time.perf_counter() - start
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    errors = predictions - y_test
+    # Direction of the predicted vs actual move from the latest close (feature column 1)
+    last_close = x_test[:, 1]
+    return {
+        "model": model_type,
+        "train_rows": len(y_train),
+        "test_rows": len(y_test),
+        "mae": float(np.abs(errors).mean()),
+        "rmse": float(np.sqrt((errors ** 2).mean())),
+        "mape": float(np.abs(errors / y_test).mean() * 100),
+        "direction_accuracy": float((np.sign(predictions - last_close) == np.sign(y_test - last_close)).mean()),
+        "fit_ms": fit_seconds * 1000,
+        "predict_us_per_row": predict_seconds * 1e6 / max(1, len(y_test)),
+        "peak_memory_kb": peak_bytes / 1024,
+    }
+
+
+def run_backtest(data_path, model_types, n_folds=5, min_train_rows=60, max_workers=None):
+    """
+    Walk-forward backtest of model_types on data_path. Folds run in parallel
+    across processes. Returns {model_type: {"folds": [...], "mean": {...}}}.
+    """
+    fold_paths = prepare_folds(data_path, n_folds, min_train_rows)
+    jobs = [(model_type, path) for model_type in model_types for path in fold_paths]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(run_fold, *zip(*jobs)))
+
+    report = {}
+    for model_type in model_types:
+        folds = [result for result in results if result["model"] == model_type]
+        metrics = [key for key, value in folds[0].items() if isinstance(value, float)]
+        report[model_type] = {
+            "folds": folds,
+            "mean": {key: float(np.mean([fold[key] for fold in folds])) for key in metrics},
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--token", default="ETH")
+    parser.add_argument("--source", default=None, choices=SOURCES)
+    parser.add_argument("--interval", default=None)
+    parser.add_argument("--models", nargs="+", default=sorted(ESTIMATORS), choices=sorted(ESTIMATORS))
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--min-train-rows", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--json", help="write the full report to this file")
+    args = parser.parse_args()
+
+    asset = find_asset(args.token, args.source, args.interval)
+    report = run_backtest(asset["data_path"], args.models, args.folds, args.min_train_rows, args.workers)
+    print(f"{'model':12s} {'MAE':>10s} {'RMSE':>10s} {'MAPE %':>8s} {'dir acc':>8s} "
+          f"{'fit ms':>9s} {'pred us/row':>12s} {'peak KB':>9s}")
+    for model_type, result in report.items():
+        mean = result["mean"]
+        print(f"{model_type:12s} {mean['mae']:10.4f} {mean['rmse']:10.4f} {mean['mape']:8.3f} "
+              f"{mean['direction_accuracy']:8.3f} {mean['fit_ms']:9.2f} {mean['predict_us_per_row']:12.3f} "
+              f"{mean['peak_memory_kb']:9.1f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
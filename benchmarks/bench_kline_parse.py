@@ -0,0 +1,130 @@
+"""
+Compare per-archive throughput and peak memory of Binance kline zip parsing.
+
+Writes synthetic monthly 1m-interval archives (about 44,640 rows each) and
+parses them in fresh subprocesses with the legacy reader (header sniffing,
+dtype inference, per-file to_datetime and one concat) and with kline_parser,
+in-process and in a process pool:
+
+    python benchmarks/bench_kline_parse.py --months 24 --workers 4
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import zipfile
+import subprocess
+import numpy as np
+import pandas as pd
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD_CODE = """
+import os, sys, json, time, resource, zipfile
+sys.path.insert(0, {repo!r})
+import pandas as pd
+import kline_parser
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+def legacy_read(path):
+    with zipfile.ZipFile(path) as myzip:
+        with myzip.open(myzip.filelist[0]) as f:
+            header = 0 if f.readline().decode("utf-8").startswith("open_time") else None
+        df = pd.read_csv(myzip.open(myzip.filelist[0]), header=header).iloc[:, :11]
+    df.columns = kline_parser.KLINE_COLUMNS
+    df.index = pd.to_datetime(df["end_time"], unit="ms")
+    df.index.name = "date"
+    return df
+
+paths = {paths!r}
+base_rss = rss_mb()
+start = time.perf_counter()
+if {variant!r} == "legacy":
+    df = pd.concat([legacy_read(path) for path in paths])
+    df = df[~df.index.duplicated(keep="last")].sort_index()
+else:
+    # As in the Binance source plugin: only dedupe and sort archives that overlap
+    df = kline_parser.read_archives(paths, workers={workers!r})
+    if not (df.index.is_monotonic_increasing and df.index.is_unique):
+        df = df[~df.index.duplicated(keep="last")].sort_index()
+elapsed = time.perf_counter() - start
+peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+worker_peak_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+print(json.dumps({{
+    "seconds": elapsed, "rows": len(df), "frame_mb": df.memory_usage(index=True).sum() / 2 ** 20,
+    "peak_mb": peak_mb - base_rss, "worker_peak_mb": worker_peak_mb,
+}}))
+"""
+
+
+def write_archives(path, months, minutes=1):
+    """Write `months` monthly kline archives with a header row; returns their paths."""
+    step_ms = minutes * 60 * 1000
+    rng = np.random.default_rng(0)
+    paths = []
+    for month in pd.date_range("2022-01-01", periods=months, freq="MS"):
+        end = month + pd.offsets.MonthBegin(1)
+        start_time = np.arange(month.value // 10 ** 6, end.value // 10 ** 6, step_ms, dtype=np.int64)
+        rows = len(start_time)
+        close = np.round(30000 + np.cumsum(rng.normal(0, 5, rows)), 2)
+        df = pd.DataFrame({
+            "open_time": start_time, "open": close, "high": close + 1.5, "low": close - 1.5, "close": close,
+            "volume": np.round(rng.random(rows) * 100, 3), "close_time": start_time + step_ms - 1,
+            "quote_volume": np.round(rng.random(rows) * 1e6, 4), "count": rng.integers(1, 5000, rows),
+            "taker_buy_volume": np.round(rng.random(rows) * 50, 3),
+            "taker_buy_quote_volume": np.round(rng.random(rows) * 5e5, 4), "ignore": 0,
+        })
+        name = f"BTCUSDT-{minutes}m-{month.year}-{month.month:02d}"
+        archive_path = os.path.join(path, f"{name}.zip")
+        with zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(f"{name}.csv", df.to_csv(index=False))
+        paths.append(archive_path)
+    return paths
+
+
+def run_child(paths, variant, workers=1):
+    code = CHILD_CODE.format(repo=REPO_PATH, paths=paths, variant=variant, workers=workers)
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--months", type=int, default=12, help="number of monthly 1m archives")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="process pool size")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        paths = write_archives(tmp_dir, args.months)
+        size_mb = sum(os.path.getsize(path) for path in paths) / 2 ** 20
+        print(f"{len(paths)} monthly 1m archives, {size_mb:.1f} MB zipped (written in {time.perf_counter() - start:.1f} s)")
+
+        results = {}
+        cases = [("legacy", "legacy", 1), ("fast", "fast", 1)]
+        if args.workers > 1:
+            cases.append((f"fast x{args.workers}", "fast", args.workers))
+        for label, variant, workers in cases:
+            result = run_child(paths, variant, workers)
+            result["archives_per_sec"] = len(paths) / result["seconds"]
+            result["ms_per_archive"] = result["seconds"] * 1000 / len(paths)
+            results[label] = result
+            print(
+                f"  {label:10s} {result['seconds']:7.2f} s  {result['ms_per_archive']:7.1f} ms/archive"
+                f"  {result['rows'] / result['seconds'] / 1e6:5.2f} M rows/s  frame {result['frame_mb']:6.1f} MB"
+                f"  peak rss +{result['peak_mb']:7.1f} MB"
+                + (f" (largest worker {result['worker_peak_mb']:.1f} MB)" if workers > 1 else "")
+            )
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Compare load time and peak RSS of the price store backends against the CSV path.
+
+Generates synthetic multi-year Binance klines, writes them with every backend
+and loads them back in fresh subprocesses so RSS numbers are not polluted by
+each other.
+
+    python benchmarks/bench_price_store.py --years 3 --intervals 1m 1h
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INTERVAL_MINUTES = {"1m": 1, "5m": 5, "15m": 15, "1h": 60, "4h": 240, "1d": 1440}
+
+CHILD_CODE = """
+import os, sys, json, time, resource
+sys.path.insert(0, {repo!r})
+import price_store
+import pandas as pd
+
+def rss_mb():
+    # Current resident set size; ru_maxrss only reports the peak including imports
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+base_rss = rss_mb()
+columns = {columns!r}
+start = time.perf_counter()
+if {legacy!r}:
+    df = pd.read_csv({path!r}, parse_dates=["date"])
+else:
+    df = price_store.load_prices({path!r}, columns=columns)
+checksum = float(df["close"].sum())
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "rss_mb": rss_mb() - base_rss, "rows": len(df)}}))
+"""
+
+
+def make_klines(years, minutes):
+    rows = int(years * 365 * 24 * 60 / minutes)
+    step_ms = minutes * 60 * 1000
+    start_time = 1577836800000 + np.arange(rows, dtype=np.int64) * step_ms
+    rng = np.random.default_rng(0)
+    close = 2000 + np.cumsum(rng.normal(0, 1, rows))
+    return pd.DataFrame({
+        "date": pd.to_datetime(start_time + step_ms - 1, unit="ms"),
+        "start_time": start_time,
+        "open": close + rng.normal(0, 0.5, rows),
+        "high": close + 1.0,
+        "low": close - 1.0,
+        "close": close,
+        "volume": rng.random(rows) * 100,
+        "end_time": start_time + step_ms - 1,
+        "volume_usd": rng.random(rows) * 1e5,
+        "n_trades": rng.integers(1, 1000, rows),
+        "taker_volume": rng.random(rows) * 50,
+        "taker_volume_usd": rng.random(rows) * 5e4,
+    })
+
+
+def run_child(path, store_format, columns=None, legacy=False):
+    env = dict(os.environ, PRICE_STORE_FORMAT=store_format, PRICE_STORE_CSV_EXPORT="false")
+    code = CHILD_CODE.format(repo=REPO_PATH, path=path, columns=columns, legacy=legacy)
+    output = subprocess.run([sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--intervals", nargs="+", default=["1m", "1h"])
+    args = parser.parse_args()
+
+    formats = ["csv", "npy"]
+    try:
+        import pyarrow  # noqa: F401
+        formats.append("parquet")
+    except ImportError:
+        print("pyarrow not installed, skipping parquet")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for interval in args.intervals:
+            df = make_klines(args.years, INTERVAL_MINUTES[interval])
+            path = os.path.join(tmp_dir, f"eth_{interval}.csv")
+            print(f"\n{interval}: {len(df):,} rows over {args.years} years")
+            for store_format in formats:
+                env = dict(os.environ, PRICE_STORE_FORMAT=store_format, PRICE_STORE_CSV_EXPORT="false")
+                save_code = (
+                    f"import sys, pandas as pd; sys.path.insert(0, {REPO_PATH!r}); import price_store; "
+                    f"price_store.save_prices(pd.read_pickle({path + '.pkl'!r}), {path!r})"
+                )
+                df.to_pickle(path + ".pkl")
+                start = time.perf_counter()
+                subprocess.run([sys.executable, "-c", save_code], env=env, check=True)
+                save_seconds = time.perf_counter() - start
+
+                cases = [("all columns", None), ("close only", ["close"])]
+                if store_format == "csv":
+                    cases.insert(0, ("legacy read_csv", "legacy"))
+                for label, columns in cases:
+                    legacy = columns == "legacy"
+                    result = run_child(path, store_format, None if legacy else columns, legacy)
+                    print(
+                        f"  {store_format:8s} {label:16s} load {result['seconds'] * 1000:9.1f} ms"
+                        f"  rss +{result['rss_mb']:8.1f} MB  (save {save_seconds:.1f} s)"
+                    )
+
+
+if __name__ == "__main__":
+    main()
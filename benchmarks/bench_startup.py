@@ -0,0 +1,108 @@
+"""
+Measure import time and RSS of the service entry modules in fresh interpreters.
+
+    python benchmarks/bench_startup.py --runs 5 --save startup.json
+    python benchmarks/bench_startup.py --baseline startup.json --tolerance 0.2
+
+With --baseline the script exits non-zero when a module got slower or bigger
+than the baseline by more than the tolerance.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["app", "model", "main", "updater"]
+
+CHILD_CODE = """
+import os, sys, json, time, importlib
+sys.path.insert(0, {repo!r})
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+base_rss = rss_mb()
+start = time.perf_counter()
+importlib.import_module({module!r})
+elapsed = time.perf_counter() - start
+heavy = sorted(name for name in ("torch", "transformers", "chronos", "sklearn") if name in sys.modules)
+print(json.dumps({{"seconds": elapsed, "rss_mb": rss_mb() - base_rss, "heavy_modules": heavy}}))
+"""
+
+
+def measure(module, env):
+    code = CHILD_CODE.format(repo=REPO_PATH, module=module)
+    output = subprocess.run([sys.executable, "-c", code], env=env, cwd=REPO_PATH, check=True,
+                            capture_output=True, text=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(module, env, top=5):
+    """Return the slowest direct imports of module (cumulative seconds) reported by -X importtime."""
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], env=env,
+                            cwd=REPO_PATH, capture_output=True, text=True)
+    rows = []
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented by two extra spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            rows.append((int(cumulative.strip()) / 1e6, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against a JSON file written with --save")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = dict(os.environ, APP_BASE_PATH=tmp_dir,
+                   INFERENCE_API_ADDRESS=os.getenv("INFERENCE_API_ADDRESS", "http://localhost:8022"))
+        for module in args.modules:
+            runs = [measure(module, env) for _ in range(args.runs)]
+            results[module] = {
+                "seconds": statistics.median(run["seconds"] for run in runs),
+                "rss_mb": statistics.median(run["rss_mb"] for run in runs),
+                "heavy_modules": runs[0]["heavy_modules"],
+            }
+            print(f"{module:10s} import {results[module]['seconds'] * 1000:8.1f} ms  "
+                  f"rss +{results[module]['rss_mb']:7.1f} MB  heavy: {', '.join(runs[0]['heavy_modules']) or '-'}")
+            for seconds, name in slowest_imports(module, env):
+                print(f"{'':12s}{seconds * 1000:8.1f} ms  {name}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = []
+        for module, result in results.items():
+            if module not in baseline:
+                continue
+            for metric in ("seconds", "rss_mb"):
+                limit = baseline[module][metric] * (1 + args.tolerance)
+                if result[metric] > limit and result[metric] - baseline[module][metric] > 0.001:
+                    regressions.append(f"{module} {metric}: {result[metric]:.3f} > {baseline[module][metric]:.3f}")
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Load test an inference server: latency percentiles and throughput.
+
+Keeps `--concurrency` keep-alive connections busy for `--duration` seconds and
+reports p50/p90/p99 latency and requests per second, e.g. to compare the
+gthread and async worker setups:
+
+    python benchmarks/load_test.py http://localhost:8022 --path /inference/ETH --concurrency 32 --duration 20
+    python benchmarks/load_test.py http://localhost:8022 --path /inference/batch --body '{"horizons": [0, 60]}'
+"""
+import json
+import time
+import argparse
+import threading
+import http.client
+from urllib.parse import urlsplit
+import numpy as np
+
+
+def _worker(url, path, body, deadline, latencies, errors, lock):
+    parts = urlsplit(url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    connection = None
+    method = "POST" if body is not None else "GET"
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    local_latencies = []
+    local_errors = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            if connection is None:
+                connection = connection_class(parts.netloc, timeout=30)
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                local_errors += 1
+                continue
+            local_latencies.append(time.perf_counter() - start)
+        except (OSError, http.client.HTTPException):
+            local_errors += 1
+            if connection is not None:
+                connection.close()
+            connection = None
+    if connection is not None:
+        connection.close()
+    with lock:
+        latencies.extend(local_latencies)
+        errors.append(local_errors)
+
+
+def run_load_test(url, path, body=None, concurrency=16, duration=10.0, warmup=1.0):
+    """Run the load test and return a dict with requests, errors, rps and latency percentiles in ms."""
+    if warmup > 0:
+        _worker(url, path, body, time.perf_counter() + warmup, [], [], threading.Lock())
+
+    latencies, errors, lock = [], [], threading.Lock()
+    start = time.perf_counter()
+    deadline = start + duration
+    threads = [
+        threading.Thread(target=_worker, args=(url, path, body, deadline, latencies, errors, lock))
+        for _ in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    result = {"requests": len(latencies), "errors": sum(errors), "seconds": round(elapsed, 3),
+              "rps": round(len(latencies) / elapsed, 1)}
+    if latencies:
+        p50, p90, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 90, 99])
+        result.update(p50_ms=round(p50, 3), p90_ms=round(p90, 3), p99_ms=round(p99, 3),
+                      max_ms=round(max(latencies) * 1000, 3))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("url", help="server base URL, e.g. http://localhost:8022")
+    parser.add_argument("--path", default="/inference/ETH")
+    parser.add_argument("--body", help="JSON body; sends POST requests instead of GET")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=1.0)
+    parser.add_argument("--json", help="write the result to this file")
+    args = parser.parse_args()
+
+    body = json.dumps(json.loads(args.body)) if args.body else None
+    result = run_load_test(args.url, args.path, body, args.concurrency, args.duration, args.warmup)
+    print(f"{args.path}: {result['requests']} requests, {result['errors']} errors in {result['seconds']}s "
+          f"-> {result['rps']} req/s")
+    if result["requests"]:
+        print(f"latency ms  p50 {result['p50_ms']}  p90 {result['p90_ms']}  p99 {result['p99_ms']}  "
+              f"max {result['max_ms']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,4 +2,101 @@ import os
 
 app_base_path = os.getenv("APP_BASE_PATH", default=os.getcwd())
 data_base_path = os.path.join(app_base_path, "data")
-model_file_path = os.path.join(data_base_path, "model.pkl")
+
+# Asset catalog: one entry per (token, source, interval) that is downloaded, trained and served.
+# Binance entries name the futures symbol and its listing date (no archives exist before it),
+# CoinGecko entries the coin id; CMC and Portals.fi entries the ticker symbol. Set
+# ASSET_CATALOG_PATH to a JSON list of entries with the same keys to serve other assets.
+default_asset_catalog = [
+    {"token": "ETH", "source": "binance", "symbol": "ETHUSDT", "interval": "1d", "listing_date": "2019-11-27"},
+    {"token": "ETH", "source": "coingecko", "symbol": "ethereum", "interval": "1d"},
+    {"token": "ETH", "source": "cmc", "symbol": "ETH", "interval": "1d"},
+    {"token": "ETH", "source": "portalsfi", "symbol": "ETH", "interval": "1d"},
+]
+asset_catalog_path = os.getenv("ASSET_CATALOG_PATH", default="")
+
+# Minimum number of seconds between checks for a retrained model file
+model_reload_interval = float(os.getenv("MODEL_RELOAD_INTERVAL", default="1.0"))
+
+# Shared model snapshot: after each update all models are published as one memory-mapped file
+# that every server worker attaches to; workers switch when its generation changes.
+# It holds model parameters only: prices are shared between workers only by the npy store
+shared_snapshot_enabled = os.getenv("SHARED_SNAPSHOT", default="true").lower() == "true"
+shared_snapshot_path = os.path.join(data_base_path, "shared")
+
+# Storage backend for price history: "npy" (memory-mapped NumPy columns), "parquet" (needs pyarrow) or "csv"
+price_store_format = os.getenv("PRICE_STORE_FORMAT", default="npy")
+# Keep writing the legacy CSV files next to the columnar store
+price_store_csv_export = os.getenv("PRICE_STORE_CSV_EXPORT", default="true").lower() == "true"
+
+# Binance public data archive; point at a local HTTP server to test downloads offline
+binance_base_url = os.getenv("BINANCE_BASE_URL", default="https://data.binance.vision")
+
+# Binance futures websocket used by stream_ingest.py; closed candles are buffered and written
+# to the price store at most every STREAM_FLUSH_INTERVAL seconds
+binance_stream_url = os.getenv("BINANCE_STREAM_URL", default="wss://fstream.binance.com")
+stream_flush_interval = float(os.getenv("STREAM_FLUSH_INTERVAL", default="5"))
+stream_reconnect_delay = float(os.getenv("STREAM_RECONNECT_DELAY", default="5"))
+
+# Archive downloader settings
+download_workers = int(os.getenv("DOWNLOAD_WORKERS", default="8"))
+download_timeout = float(os.getenv("DOWNLOAD_TIMEOUT", default="30"))
+download_retries = int(os.getenv("DOWNLOAD_RETRIES", default="3"))
+download_backoff = float(os.getenv("DOWNLOAD_BACKOFF", default="1.0"))
+# 0 disables bandwidth limiting
+download_max_bytes_per_sec = int(os.getenv("DOWNLOAD_MAX_BYTES_PER_SEC", default="0"))
+
+# REST price sources (CoinGecko, CoinMarketCap, Portals.fi): responses are cached on disk and
+# reused without a request for SOURCE_CACHE_TTL seconds, then revalidated with ETag/Last-Modified
+source_cache_path = os.path.join(data_base_path, "http_cache")
+source_cache_ttl = float(os.getenv("SOURCE_CACHE_TTL", default="60"))
+# Request quotas per minute per source (0 = unlimited), e.g. SOURCE_RATE_LIMITS="coingecko=10,cmc=30",
+# and the number of requests that may go out at once before requests are spaced at the quota rate
+source_rate_limits = {"coingecko": 30.0, "cmc": 30.0, "portalsfi": 60.0}
+source_rate_limits.update(
+    (name.strip(), float(value))
+    for name, value in (
+        item.split("=", 1) for item in os.getenv("SOURCE_RATE_LIMITS", default="").split(",") if "=" in item
+    )
+)
+source_rate_burst = int(os.getenv("SOURCE_RATE_BURST", default="5"))
+
+# Processes decoding Binance archives in parallel when formatting many of them (0 = CPU count)
+format_workers = int(os.getenv("FORMAT_WORKERS", default="0"))
+
+# Update pipeline: worker threads (assets are updated in parallel) and per-asset time budget in seconds
+update_workers = int(os.getenv("UPDATE_WORKERS", default="4"))
+update_source_timeout = float(os.getenv("UPDATE_SOURCE_TIMEOUT", default="900"))
+# Overrides per source or per asset key, e.g. UPDATE_SOURCE_TIMEOUTS="coingecko=60,BTC/binance/1h=300"
+update_source_timeouts = {
+    name.strip(): float(value)
+    for name, value in (
+        item.split("=", 1) for item in os.getenv("UPDATE_SOURCE_TIMEOUTS", default="").split(",") if "=" in item
+    )
+}
+
+# Run an update when a gunicorn worker starts
+update_on_start = os.getenv("UPDATE_ON_START", default="true").lower() == "true"
+
+# Cross-process update lock and the status file served by /update/status
+update_lock_path = os.path.join(data_base_path, "update.lock")
+update_status_path = os.path.join(data_base_path, "update_status.json")
+
+# Model type trained and served; heavy backends (e.g. "chronos") import their ML stack on demand
+model_type = os.getenv("MODEL_TYPE", default="linear")
+
+# Incremental training: number of incremental model updates before a full refit
+model_full_refit_every = int(os.getenv("MODEL_FULL_REFIT_EVERY", default="30"))
+
+# Per-fold feature matrices cached by the walk-forward backtest
+backtest_cache_path = os.path.join(data_base_path, "backtest_cache")
+
+# Seconds between stack samples of the sampling profiler served on /profile; 0 disables it
+profile_sample_interval = float(os.getenv("PROFILE_SAMPLE_INTERVAL", default="0"))
+
+# Prediction cache: time bucket width in seconds (0 disables caching), size, entry TTL in seconds,
+# and the number of upcoming buckets precomputed after each training run
+prediction_bucket_seconds = int(os.getenv("PREDICTION_BUCKET_SECONDS", default="60"))
+prediction_cache_size = int(os.getenv("PREDICTION_CACHE_SIZE", default="4096"))
+prediction_cache_ttl = float(os.getenv("PREDICTION_CACHE_TTL", default="3600"))
+prediction_precompute_buckets = int(os.getenv("PREDICTION_PRECOMPUTE_BUCKETS", default="60"))
@@ -0,0 +1,216 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+from config import (
+    download_workers, download_timeout, download_retries, download_backoff, download_max_bytes_per_sec
+)
+from metrics import DOWNLOAD_BYTES, DOWNLOAD_RESPONSES, DOWNLOAD_RETRIES, STAGE_SECONDS
+
+# HTTP statuses worth retrying; everything else except 200/404 fails immediately
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ChecksumError(Exception):
+    pass
+
+
+class RetryableHTTPError(requests.HTTPError):
+    """A 429/5xx response, optionally carrying the server's Retry-After delay."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Throttle:
+    """Shared token bucket limiting the aggregate download rate."""
+
+    def __init__(self, bytes_per_sec):
+        self._rate = bytes_per_sec
+        self._lock = threading.Lock()
+        self._next_time = time.monotonic()
+
+    def consume(self, n_bytes):
+        if not self._rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_time)
+            self._next_time = start + n_bytes / self._rate
+            delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Downloader:
+    """
+    Download files over pooled keep-alive connections with bounded concurrency.
+
+    Each file is streamed to a temporary file next to the target and renamed
+    into place once complete (and, when a `.CHECKSUM` file is published next to
+    it, once its SHA-256 matches). Connection errors and 429/5xx responses are
+    retried with exponential backoff; 404s are reported as missing.
+    """
+
+    def __init__(self, max_workers=download_workers, timeout=download_timeout, retries=download_retries,
+                 backoff=download_backoff, max_bytes_per_sec=download_max_bytes_per_sec,
+                 verify_checksum=True, chunk_size=1 << 16):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.verify_checksum = verify_checksum
+        self.chunk_size = chunk_size
+        self._throttle = _Throttle(max_bytes_per_sec)
+        self._local = threading.local()
+
+    def _session(self):
+        # requests.Session is not documented as thread-safe, so keep one pooled session per thread
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+        return session
+
+    def _expected_checksum(self, url):
+        response = self._session().get(f"{url}.CHECKSUM", timeout=self.timeout)
+        if response.status_code != 200:
+            return None
+        return response.text.split()[0].strip().lower() if response.text.strip() else None
+
+    def _fetch(self, url, target_file_path):
+        tmp_path = f"{target_file_path}.part"
+        digest = hashlib.sha256()
+        n_bytes = 0
+        with self._session().get(url, stream=True, timeout=self.timeout) as response:
+            DOWNLOAD_RESPONSES.inc(status=response.status_code)
+            if response.status_code == 404:
+                return None
+            if response.status_code in RETRY_STATUSES:
+                retry_after = response.headers.get("Retry-After")
+                raise RetryableHTTPError(
+                    f"HTTP {response.status_code} for {url}",
+                    retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+                )
+            response.raise_for_status()
+            os.makedirs(os.path.dirname(target_file_path) or ".", exist_ok=True)
+            try:
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        self._throttle.consume(len(chunk))
+                        DOWNLOAD_BYTES.inc(len(chunk))
+                        f.write(chunk)
+                        digest.update(chunk)
+                        n_bytes += len(chunk)
+                if self.verify_checksum:
+                    expected = self._expected_checksum(url)
+                    if expected is not None and expected != digest.hexdigest():
+                        raise ChecksumError(f"Checksum mismatch for {url}")
+                os.replace(tmp_path, target_file_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return n_bytes
+
+    def download(self, url, download_path):
+        """
+        Download url into download_path and return a result dict with the
+        status ("downloaded", "exists", "missing" or "failed"), size, timing
+        and throughput.
+        """
+        target_file_path = os.path.join(download_path, os.path.basename(url))
+        result = {"url": url, "path": target_file_path, "status": "exists", "bytes": 0,
+                  "seconds": 0.0, "bytes_per_sec": 0.0, "attempts": 0, "error": None}
+        if os.path.exists(target_file_path):
+            logging.info(f"File already exists: {url}")
+            return result
+
+        start = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            result["attempts"] = attempt + 1
+            retry_after = None
+            try:
+                n_bytes = self._fetch(url, target_file_path)
+            except RetryableHTTPError as e:
+                result["error"] = str(e)
+                retry_after = e.retry_after
+            except requests.HTTPError as e:
+                # Other 4xx responses will not succeed on retry
+                result["error"] = str(e)
+                break
+            except (requests.RequestException, ChecksumError) as e:
+                result["error"] = str(e)
+            else:
+                result["seconds"] = time.perf_counter() - start
+                STAGE_SECONDS.observe(result["seconds"], stage="download_file")
+                if n_bytes is None:
+                    result["status"] = "missing"
+                    logging.warning(f"File does not exist: {url}")
+                else:
+                    result.update(status="downloaded", bytes=n_bytes, error=None)
+                    result["bytes_per_sec"] = n_bytes / result["seconds"] if result["seconds"] else 0.0
+                    logging.info(
+                        f"Downloaded: {url} to {target_file_path} "
+                        f"({n_bytes} bytes in {result['seconds']:.2f}s, {result['bytes_per_sec'] / 1024:.1f} KiB/s)"
+                    )
+                return result
+
+            if attempt < self.retries:
+                delay = retry_after if retry_after is not None else self.backoff * 2 ** attempt
+                logging.warning(f"Retrying {url} in {delay:.1f}s after error: {result['error']}")
+                DOWNLOAD_RETRIES.inc()
+                time.sleep(delay)
+
+        result["status"] = "failed"
+        result["seconds"] = time.perf_counter() - start
+        logging.error(f"Failed to download {url} after {result['attempts']} attempts: {result['error']}")
+        return result
+
+    def download_many(self, urls, download_path):
+        """
+        Download urls concurrently and return their result dicts in input order.
+        Failures are logged and reported in the results instead of being dropped.
+        """
+        start = time.perf_counter()
+        results = [None] * len(urls)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.download, url, download_path): i for i, url in enumerate(urls)}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    logging.error(f"Unexpected error downloading {urls[i]}: {e}")
+                    results[i] = {"url": urls[i], "path": None, "status": "failed", "bytes": 0, "seconds": 0.0,
+                                  "bytes_per_sec": 0.0, "attempts": 0, "error": str(e)}
+
+        elapsed = time.perf_counter() - start
+        summary = summarize_downloads(results, elapsed)
+        logging.info(
+            f"Downloaded {summary['downloaded']} of {len(urls)} files ({summary['missing']} missing, "
+            f"{summary['failed']} failed, {summary['bytes']} bytes in {elapsed:.2f}s)"
+        )
+        return results
+
+
+def summarize_downloads(results, elapsed=None):
+    """Aggregate download result dicts into counts, bytes and throughput."""
+    summary = {"downloaded": 0, "exists": 0, "missing": 0, "failed": 0, "bytes": 0}
+    for result in results:
+        summary[result["status"]] += 1
+        summary["bytes"] += result["bytes"]
+    if elapsed:
+        summary["seconds"] = elapsed
+        summary["bytes_per_sec"] = summary["bytes"] / elapsed
+    return summary
+
+
+default_downloader = Downloader()
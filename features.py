@@ -0,0 +1,151 @@
+from collections import deque
+import numpy as np
+import pandas as pd
+
+# Return lags and rolling window lengths, in candles
+LAGS = (1, 2, 3)
+WINDOWS = (7, 14, 30)
+
+# Candles of history needed to compute one complete feature row
+HISTORY = max(max(WINDOWS), max(LAGS)) + 1
+
+# The time feature is expressed in years since this origin to keep it well scaled
+TIME_ORIGIN = pd.Timestamp("2020-01-01").timestamp()
+SECONDS_PER_YEAR = 365.25 * 24 * 3600
+
+
+def time_feature(timestamps):
+    """Convert epoch seconds to the model's time feature."""
+    return (np.asarray(timestamps, dtype=float) - TIME_ORIGIN) / SECONDS_PER_YEAR
+
+
+def price_column(columns):
+    """Binance klines carry "close", the REST sources a single "price" column."""
+    return "close" if "close" in columns else "price"
+
+
+def feature_names(columns):
+    """Names of the features computable from a price frame with the given columns, in order."""
+    names = ["t", "close"] + [f"ret_lag{lag}" for lag in LAGS]
+    names += [f"sma_gap{w}" for w in WINDOWS] + [f"volatility{w}" for w in WINDOWS]
+    if "volume" in columns:
+        names += [f"volume_ratio{w}" for w in WINDOWS]
+        if "taker_volume" in columns:
+            names.append("taker_ratio")
+    if "high" in columns and "low" in columns:
+        names.append("hl_range")
+    return names
+
+
+def epoch_seconds(dates):
+    """Vectorized conversion of a datetime column to float epoch seconds."""
+    return pd.to_datetime(dates).to_numpy(dtype="datetime64[ns]").astype(np.int64) / 1e9
+
+
+def build_features(price_data):
+    """
+    Compute the feature frame for every row of a price frame with a "date"
+    column, using only vectorized pandas/NumPy operations. Rows without enough
+    history contain NaNs.
+    """
+    columns = list(price_data.columns)
+    close = pd.Series(np.asarray(price_data[price_column(columns)], dtype=float))
+    returns = close.pct_change()
+
+    features = {"t": time_feature(epoch_seconds(price_data["date"])), "close": close.to_numpy()}
+    for lag in LAGS:
+        features[f"ret_lag{lag}"] = returns.shift(lag - 1).to_numpy()
+    for w in WINDOWS:
+        features[f"sma_gap{w}"] = (close / close.rolling(w).mean() - 1).to_numpy()
+    for w in WINDOWS:
+        features[f"volatility{w}"] = returns.rolling(w).std().to_numpy()
+    if "volume" in columns:
+        volume = pd.Series(np.asarray(price_data["volume"], dtype=float))
+        for w in WINDOWS:
+            features[f"volume_ratio{w}"] = (volume / volume.rolling(w).mean()).to_numpy()
+        if "taker_volume" in columns:
+            features["taker_ratio"] = np.asarray(price_data["taker_volume"], dtype=float) / volume.to_numpy()
+    if "high" in columns and "low" in columns:
+        high = np.asarray(price_data["high"], dtype=float)
+        low = np.asarray(price_data["low"], dtype=float)
+        features["hl_range"] = (high - low) / close.to_numpy()
+    return pd.DataFrame(features, columns=feature_names(columns))
+
+
+def training_matrix(features):
+    """
+    Turn a feature frame into (X, y, target_times) for next-candle prediction.
+
+    Each row's features predict the next close; its time feature is replaced
+    by the time of that next candle so the model learns price as a function of
+    the target time given the latest market state.
+    """
+    values = features.to_numpy(dtype=float)
+    X = values[:-1].copy()
+    X[:, 0] = values[1:, 0]
+    y = values[1:, features.columns.get_loc("close")]
+    valid = np.isfinite(X).all(axis=1) & np.isfinite(y)
+    return X[valid], y[valid], values[1:, 0][valid]
+
+
+class FeatureState:
+    """
+    Streaming feature computation over the last HISTORY candles.
+
+    Appending one candle and computing its feature row costs O(window)
+    instead of recomputing the full history, and yields the same values as
+    the last row of build_features.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.names = feature_names(self.columns)
+        self._price_column = price_column(self.columns)
+        self._timestamps = deque(maxlen=HISTORY)
+        self._candles = {
+            name: deque(maxlen=HISTORY)
+            for name in (self._price_column, "volume", "taker_volume", "high", "low")
+            if name in self.columns
+        }
+
+    @classmethod
+    def from_frame(cls, price_data):
+        """Initialise the state from the tail of a price frame."""
+        state = cls(price_data.columns)
+        tail = price_data.tail(HISTORY)
+        state._timestamps.extend(epoch_seconds(tail["date"]))
+        for name, values in state._candles.items():
+            values.extend(np.asarray(tail[name], dtype=float))
+        return state
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    def update(self, candle):
+        """Append one candle (a mapping with "date" and the price columns) and return its feature row."""
+        self._timestamps.append(float(epoch_seconds([candle["date"]])[0]))
+        for name, values in self._candles.items():
+            values.append(float(candle[name]))
+        return self.current()
+
+    def current(self):
+        """Return the feature row of the latest candle as a NumPy array ordered like self.names."""
+        close = np.fromiter(self._candles[self._price_column], dtype=float)
+        n = len(close)
+        returns = close[1:] / close[:-1] - 1 if n > 1 else np.empty(0)
+        row = {"t": time_feature(self._timestamps[-1]), "close": close[-1]}
+        for lag in LAGS:
+            row[f"ret_lag{lag}"] = returns[-lag] if len(returns) >= lag else np.nan
+        for w in WINDOWS:
+            row[f"sma_gap{w}"] = close[-1] / close[-w:].mean() - 1 if n >= w else np.nan
+        for w in WINDOWS:
+            row[f"volatility{w}"] = returns[-w:].std(ddof=1) if len(returns) >= w else np.nan
+        if "volume" in self._candles:
+            volume = np.fromiter(self._candles["volume"], dtype=float)
+            for w in WINDOWS:
+                row[f"volume_ratio{w}"] = volume[-1] / volume[-w:].mean() if n >= w else np.nan
+            if "taker_volume" in self._candles:
+                row["taker_ratio"] = self._candles["taker_volume"][-1] / volume[-1]
+        if "high" in self._candles and "low" in self._candles:
+            row["hl_range"] = (self._candles["high"][-1] - self._candles["low"][-1]) / close[-1]
+        return np.array([row[name] for name in self.names], dtype=float)
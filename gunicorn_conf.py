@@ -1,3 +1,6 @@
+import os
+from config import update_on_start
+
 # Gunicorn config variables
 loglevel = "info"
 errorlog = "-"  # stderr
@@ -6,7 +9,16 @@ worker_tmp_dir = "/dev/shm"
 graceful_timeout = 120
 timeout = 30
 keepalive = 5
-worker_class = "gthread"
-workers = 2
-threads = 8
-bind = "0.0.0.0:9000"
+# "gthread" serves app:app; "uvicorn.workers.UvicornWorker" serves the async asgi:app
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:9000")
+
+
+def post_worker_init(worker):
+    # Refresh data and models when the server starts, like `python app.py` does
+    if update_on_start:
+        # Every worker triggers; the update lock merges them into a single job
+        from app import trigger_update
+        trigger_update()
@@ -0,0 +1,90 @@
+import os
+import json
+import threading
+import logging
+from price_store import primary_path, read_last_row
+
+_latest = {}
+_lock = threading.Lock()
+
+
+def _file_version(data_path):
+    path = primary_path(data_path)
+    if not os.path.exists(path):
+        path = data_path
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _sidecar_path(data_path):
+    return f"{data_path}.latest.json"
+
+
+def _coerce(value):
+    if isinstance(value, (int, float)) or value is None:
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def record_latest(data_path, df):
+    """
+    Remember the last row of a price DataFrame that was just written to data_path.
+
+    The row is cached in memory and in a small JSON sidecar next to the data
+    file, so other processes can read it without parsing the price file.
+    """
+    if df.empty:
+        return
+    last = df.tail(1)
+    if last.index.name is not None:
+        last = last.reset_index()
+    row = {str(k): _coerce(v) for k, v in last.to_dict(orient="records")[0].items()}
+
+    version = _file_version(data_path)
+    with _lock:
+        _latest[data_path] = (version, row)
+
+    tmp_path = f"{_sidecar_path(data_path)}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"version": version, "row": row}, f)
+    os.replace(tmp_path, _sidecar_path(data_path))
+
+
+def get_latest(data_path):
+    """
+    Return the latest observation stored in data_path as a dict, or None.
+
+    Served from memory while the store is unchanged, then from the sidecar
+    written by the update pipeline, and only as a last resort from the last
+    row of the store itself (the tail bytes for CSV files).
+    """
+    try:
+        version = _file_version(data_path)
+    except FileNotFoundError:
+        return None
+
+    cached = _latest.get(data_path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    row = None
+    try:
+        with open(_sidecar_path(data_path)) as f:
+            sidecar = json.load(f)
+        if sidecar.get("version") == version:
+            row = sidecar["row"]
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+
+    if row is None:
+        logging.info(f"Latest observation cache cold for {data_path}, reading last stored row.")
+        row = read_last_row(data_path)
+        if row is not None:
+            row = {name: _coerce(value) for name, value in row.items()}
+
+    with _lock:
+        _latest[data_path] = (version, row)
+    return row
@@ -1,8 +1,14 @@
 import os
-import requests
 import sys
 import json
+import time
+import fcntl
+import socket
 import logging
+import threading
+import subprocess
+import socketserver
+from collections import OrderedDict
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -14,20 +20,38 @@ if not INFERENCE_ADDRESS:
     logging.error("INFERENCE_API_ADDRESS environment variable not set.")
     sys.exit(1)
 
-def process(token_name, data_source):
+# Local worker daemon: Unix socket it listens on, seconds answers are cached, seconds without
+# requests before it exits, and whether a call starts the daemon when none is running
+DAEMON_SOCKET = os.getenv("MAIN_DAEMON_SOCKET", "/tmp/allora-inference-worker.sock")
+CACHE_TTL = float(os.getenv("MAIN_CACHE_TTL", "30"))
+CACHE_SIZE = 1024
+DAEMON_IDLE_TIMEOUT = float(os.getenv("MAIN_DAEMON_IDLE_TIMEOUT", "600"))
+DAEMON_AUTOSTART = os.getenv("MAIN_DAEMON_AUTOSTART", "true").lower() == "true"
+REQUEST_TIMEOUT = float(os.getenv("MAIN_REQUEST_TIMEOUT", "30"))
+# Extra seconds a caller waits on the daemon, which answers (or fails) within REQUEST_TIMEOUT
+DAEMON_REPLY_MARGIN = 5.0
+
+
+def process(token_name, data_source, session=None):
     """
     Sends a GET request to the inference API with the specified token name and data source.
 
     Args:
         token_name (str): The token name to query the inference API.
         data_source (str): The data source to use for inference ('binance', 'coingecko', 'cmc', 'portalsfi').
+        session (requests.Session): Optional pooled session to reuse the connection.
 
     Returns:
         str: The response content from the API.
     """
+    # Imported here so calls answered by the daemon never pay for importing requests
+    import requests
+
     try:
         logging.info(f"Sending request to inference API for token: {token_name} using data source: {data_source}")
-        response = requests.get(f"{INFERENCE_ADDRESS}/inference/{token_name}?source={data_source}")
+        response = (session or requests).get(
+            f"{INFERENCE_ADDRESS}/inference/{token_name}", params={"source": data_source}, timeout=REQUEST_TIMEOUT
+        )
         response.raise_for_status()
         logging.info(f"Received response from inference API: {response.status_code}")
         return response.text
@@ -35,6 +59,181 @@ def process(token_name, data_source):
         logging.error(f"Error making request to inference API: {e}")
         raise
 
+
+class AnswerCache:
+    """
+    Short-lived cache of inference answers keyed by (token, source, block height).
+
+    Concurrent requests for the same key wait for the one request in flight
+    instead of each calling the inference API, and share its answer or error.
+    """
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, key):
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() > entry[1]:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def get_or_fetch(self, key, fetch):
+        with self._lock:
+            value = self._cached(key)
+            if value is not None:
+                return value
+            inflight = self._inflight.get(key)
+            owner = inflight is None
+            if owner:
+                inflight = self._inflight[key] = {"event": threading.Event(), "error": None}
+
+        if not owner:
+            # Never wait longer than one request, so callers get an answer within their own timeout
+            if not inflight["event"].wait(REQUEST_TIMEOUT):
+                raise TimeoutError(f"No answer for {key} within {REQUEST_TIMEOUT}s")
+            if inflight["error"] is not None:
+                raise RuntimeError(inflight["error"])
+            with self._lock:
+                value = self._cached(key)
+            return value if value is not None else fetch()
+
+        try:
+            value = fetch()
+            with self._lock:
+                self._entries[key] = (value, time.monotonic() + self.ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return value
+        except Exception as e:
+            inflight["error"] = str(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            inflight["event"].set()
+
+
+class _DaemonHandler(socketserver.StreamRequestHandler):
+    """Answers one newline-terminated JSON request per connection."""
+
+    def handle(self):
+        server = self.server
+        server.last_request_at = time.monotonic()
+        try:
+            request = json.loads(self.rfile.readline())
+            token_name, data_source = request["token"], request.get("source")
+            block_height = request.get("block_height")
+
+            def fetch():
+                return process(token_name, data_source, server.session)
+
+            if block_height is None:
+                value = fetch()
+            else:
+                value = server.cache.get_or_fetch((token_name, data_source, str(block_height)), fetch)
+            reply = {"value": value}
+        except Exception as e:
+            reply = {"error": str(e)}
+        self.wfile.write((json.dumps(reply) + "\n").encode())
+
+
+def _connect(timeout=REQUEST_TIMEOUT + DAEMON_REPLY_MARGIN):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        client.connect(DAEMON_SOCKET)
+    except OSError:
+        client.close()
+        raise
+    return client
+
+
+def run_daemon():
+    """
+    Serve inference requests on the Unix socket with a pooled keep-alive
+    session and the answer cache, until idle for DAEMON_IDLE_TIMEOUT seconds.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    # The daemon holds an exclusive lock for its lifetime; a second one started by a
+    # racing call exits here instead of replacing the first one's socket
+    lock_fd = os.open(f"{DAEMON_SOCKET}.lock", os.O_CREAT | os.O_RDWR, 0o600)
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(lock_fd)
+        logging.info(f"Worker daemon already running on {DAEMON_SOCKET}")
+        return
+    # Left behind by a daemon that did not exit cleanly
+    if os.path.exists(DAEMON_SOCKET):
+        os.remove(DAEMON_SOCKET)
+
+    socketserver.ThreadingUnixStreamServer.daemon_threads = True
+    server = socketserver.ThreadingUnixStreamServer(DAEMON_SOCKET, _DaemonHandler)
+    server.session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=16)
+    server.session.mount("http://", adapter)
+    server.session.mount("https://", adapter)
+    server.cache = AnswerCache(CACHE_TTL, CACHE_SIZE)
+    server.last_request_at = time.monotonic()
+
+    thread = threading.Thread(target=server.serve_forever, name="worker-daemon", daemon=True)
+    thread.start()
+    logging.info(f"Worker daemon listening on {DAEMON_SOCKET}")
+    try:
+        while time.monotonic() - server.last_request_at < DAEMON_IDLE_TIMEOUT:
+            time.sleep(min(1.0, DAEMON_IDLE_TIMEOUT))
+        logging.info(f"Worker daemon idle for {DAEMON_IDLE_TIMEOUT}s, exiting")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        if os.path.exists(DAEMON_SOCKET):
+            os.remove(DAEMON_SOCKET)
+        fcntl.flock(lock_fd, fcntl.LOCK_UN)
+        os.close(lock_fd)
+
+
+def _start_daemon():
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--daemon"],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def query(token_name, data_source, block_height=None):
+    """
+    Return the inference for the token, through the local worker daemon when
+    it is running and directly from the inference API otherwise.
+    """
+    try:
+        client = _connect()
+    except OSError:
+        if DAEMON_AUTOSTART:
+            _start_daemon()
+        return process(token_name, data_source)
+
+    with client:
+        request = {"token": token_name, "source": data_source, "block_height": block_height}
+        client.sendall((json.dumps(request) + "\n").encode())
+        reply = client.makefile("rb").readline()
+    if not reply:
+        raise RuntimeError("Worker daemon closed the connection without answering")
+    reply = json.loads(reply)
+    if "error" in reply:
+        raise RuntimeError(reply["error"])
+    return reply["value"]
+
+
 def get_env_var(var_name, default_value=None):
     value = os.getenv(var_name)
     if value is None and default_value is None:
@@ -43,6 +242,10 @@ def get_env_var(var_name, default_value=None):
     return value or default_value
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--daemon":
+        run_daemon()
+        sys.exit(0)
+
     # Retrieve arguments from environment variables or command line
     try:
         topic_id = get_env_var("TOPIC_ID", sys.argv[1] if len(sys.argv) > 1 else None)
@@ -53,7 +256,7 @@ if __name__ == "__main__":
 
         logging.info(f"Received arguments: topic_id={topic_id}, blockHeight={blockHeight}, blockHeightEval={blockHeightEval}, default_arg={default_arg}, data_source={data_source}")
 
-        response_inference = process(token_name=default_arg, data_source=data_source)
+        response_inference = query(token_name=default_arg, data_source=data_source, block_height=blockHeight)
         response_dict = {"infererValue": response_inference}
         value = json.dumps(response_dict)
         logging.info(f"Processed inference successfully. Response: {response_dict}")
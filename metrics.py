@@ -0,0 +1,211 @@
+import os
+import sys
+import time
+import bisect
+import logging
+import threading
+import functools
+from collections import Counter as _FrameCounter
+from contextlib import contextmanager
+from config import profile_sample_interval
+
+# Histogram bucket upper bounds in seconds, from sub-millisecond predictions to full updates
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 120.0, 600.0)
+
+# Metric name prefix
+NAMESPACE = "price_node"
+
+
+def _label_text(labelnames, values):
+    if not labelnames:
+        return ""
+    pairs = []
+    for name, value in zip(labelnames, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, "") for name in self.labelnames), 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0)]
+        return [f"{self.name}{_label_text(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Histogram:
+    """Cumulative histogram of observed values (seconds) with optional labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _label_text(self.labelnames + ("le",), key + (le,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _label_text(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """The metrics of this process, rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(f"{NAMESPACE}_{name}", documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(f"{NAMESPACE}_{name}", documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "stage_seconds", "Time spent in a stage (load, predict, download, format, train, ...) per source.",
+    ("stage", "source"),
+)
+REQUEST_SECONDS = registry.histogram(
+    "http_request_seconds", "HTTP request latency per endpoint and status code.", ("endpoint", "status"),
+)
+CACHE_LOOKUPS = registry.counter("prediction_cache_lookups_total", "Prediction cache lookups by result.", ("result",))
+DOWNLOAD_BYTES = registry.counter("download_bytes_total", "Bytes downloaded by the archive downloader.")
+DOWNLOAD_RESPONSES = registry.counter(
+    "download_responses_total", "HTTP responses received by the archive downloader by status code.", ("status",),
+)
+DOWNLOAD_RETRIES = registry.counter("download_retries_total", "Download attempts that were retried.")
+SOURCE_REQUESTS = registry.counter(
+    "source_requests_total",
+    "REST price source requests by source and result (cache, not_modified, fetched, error).", ("source", "result"),
+)
+
+
+@contextmanager
+def timed(stage, source=""):
+    """Record the duration of the block in the stage histogram, also when it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage, source=source)
+
+
+def timed_function(stage):
+    """Decorator recording every call of the function in the stage histogram."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler sampling the stacks of all other threads every
+    `interval` seconds from a daemon thread. Samples are aggregated as
+    folded stacks ("outer;inner count"), the input format of flame graph tools.
+    """
+
+    def __init__(self, interval, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks = _FrameCounter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+            logging.info(f"Sampling profiler started, interval {self.interval}s")
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            folded = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                names = []
+                while frame is not None and len(names) < self.max_depth:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                folded.append(";".join(reversed(names)))
+            with self._lock:
+                self._stacks.update(folded)
+                self.samples += 1
+
+    def folded(self, limit=None):
+        """Return the sampled stacks in folded format, most frequent first."""
+        with self._lock:
+            stacks = self._stacks.most_common(limit)
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+
+profiler = SamplingProfiler(profile_sample_interval) if profile_sample_interval > 0 else None
@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+import logging
+from datetime import datetime
+from config import model_reload_interval, shared_snapshot_enabled
+from assets import catalog
+from shared_snapshot import shared_snapshot, artifact_version
+from backends import load_model
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of trained models keyed by asset key (e.g. "ETH/binance/1d").
+
+    Models published in the shared snapshot are served from it, so all
+    workers map the same parameters and switch generations together, unless
+    the model file was rewritten after publishing. Other
+    model artifacts are loaded once and kept in memory. The model file is
+    re-checked at most every `reload_interval` seconds; when its mtime, size
+    or inode changes the new file is loaded and swapped in atomically, so
+    concurrent readers always see either the old or the new model.
+    """
+
+    def __init__(self, path_map, reload_interval=1.0, snapshot=None):
+        self._path_map = dict(path_map)
+        self._reload_interval = reload_interval
+        self._snapshot = snapshot
+        self._entries = {}
+        self._checked_at = {}
+        # Model file versions seen by _newer_on_disk and when they were checked
+        self._disk_versions = {}
+        self._disk_checked_at = {}
+        self._locks = {source: threading.Lock() for source in self._path_map}
+
+    def sources(self):
+        return list(self._path_map)
+
+    def get(self, source):
+        """Return the current model for the given data source."""
+        return self._entry(source)[1]
+
+    def version(self, source):
+        """Return an opaque version of the model currently served for the source."""
+        return self._entry(source)[0]
+
+    def get_with_version(self, source, check=True):
+        """
+        Return (version, model) for the source from a single consistent lookup.
+        With check=False a model already in memory is returned without looking
+        for a newer one on disk.
+        """
+        return self._entry(source, check)
+
+    def in_memory(self, source):
+        """Whether get_with_version(source, check=False) is served without reading any file."""
+        if self._snapshot is not None:
+            published = self._snapshot.in_memory(source)
+            if published is None:
+                return False
+            if published and not self._newer_on_disk(source, check=False):
+                return True
+        return source in self._entries
+
+    def refresh(self):
+        """
+        Re-check the snapshot and the models already in memory now, so that
+        lookups with check=False pick up new models; meant for a background task.
+        """
+        if self._snapshot is not None:
+            self._snapshot.invalidate()
+            self._snapshot.generation()
+        for source in set(self._entries) | set(self._disk_versions):
+            self._checked_at.pop(source, None)
+            self._disk_checked_at.pop(source, None)
+            try:
+                self._entry(source)
+            except Exception as e:
+                logging.warning(f"Refreshing model for {source} failed: {e}")
+
+    def _entry(self, source, check=True):
+        if source not in self._path_map:
+            raise ValueError(f"Asset '{source}' not supported")
+
+        if self._snapshot is not None:
+            entry = self._snapshot.get(source, check)
+            if entry is not None and not self._newer_on_disk(source, check):
+                return entry
+
+        entry = self._entries.get(source)
+        if entry is not None and (
+            not check or time.monotonic() - self._checked_at.get(source, 0.0) < self._reload_interval
+        ):
+            return entry
+
+        with self._locks[source]:
+            entry = self._entries.get(source)
+            path = self._path_map[source]
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                if entry is None:
+                    logging.error(f"Model file for {source} not found.")
+                    raise
+                logging.warning(f"Model file for {source} disappeared, serving cached model.")
+                self._checked_at[source] = time.monotonic()
+                return entry
+
+            version = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            if entry is None or entry[0] != version:
+                loaded_model = load_model(path)
+                entry = (version, loaded_model)
+                self._entries[source] = entry
+                logging.info(f"Loaded model for {source} successfully at {datetime.now()}")
+            self._checked_at[source] = time.monotonic()
+            return entry
+
+    def _newer_on_disk(self, source, check):
+        """
+        Whether the model file was rewritten after the snapshot was published
+        (e.g. trained outside an update job); its model is then served instead.
+        The file is stat'ed at most every reload interval.
+        """
+        if check and time.monotonic() - self._disk_checked_at.get(source, 0.0) >= self._reload_interval:
+            try:
+                self._disk_versions[source] = artifact_version(self._path_map[source])
+            except FileNotFoundError:
+                self._disk_versions[source] = None
+            self._disk_checked_at[source] = time.monotonic()
+        disk = self._disk_versions.get(source)
+        return disk is not None and disk != self._snapshot.published_version(source, check=False)
+
+    def invalidate(self, source=None):
+        """Force the next lookup to re-check the snapshot and model file(s)."""
+        if self._snapshot is not None:
+            self._snapshot.invalidate()
+        sources = self._path_map if source is None else [source]
+        for name in sources:
+            self._checked_at.pop(name, None)
+            self._disk_checked_at.pop(name, None)
+
+
+model_registry = ModelRegistry(
+    {key: asset["model_path"] for key, asset in catalog.items()},
+    model_reload_interval,
+    shared_snapshot if shared_snapshot_enabled else None,
+)
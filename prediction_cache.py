@@ -0,0 +1,90 @@
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+from config import prediction_bucket_seconds, prediction_cache_size, prediction_cache_ttl
+from metrics import CACHE_LOOKUPS
+
+
+class PredictionCache:
+    """
+    LRU cache of predictions keyed by (source, model version, time bucket).
+
+    Every timestamp inside a bucket is served the prediction for the bucket
+    start. Entries expire after `ttl` seconds and the least recently used
+    entry is evicted past `max_entries`. A retrained model has a new version,
+    so its predictions never collide with the old model's.
+    """
+
+    def __init__(self, bucket_seconds, max_entries, ttl):
+        self.bucket_seconds = bucket_seconds
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.bucket_seconds > 0 and self.max_entries > 0
+
+    def bucket_start(self, timestamp):
+        return float(timestamp // self.bucket_seconds * self.bucket_seconds)
+
+    def get(self, source, version, bucket_start):
+        key = (source, version, bucket_start)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() > entry[1]:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                CACHE_LOOKUPS.inc(result="miss")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            CACHE_LOOKUPS.inc(result="hit")
+            return entry[0]
+
+    def put(self, source, version, bucket_start, value):
+        with self._lock:
+            self._entries[(source, version, bucket_start)] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end((source, version, bucket_start))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, source, version, timestamp, compute):
+        """Return the cached prediction for timestamp's bucket, calling compute(bucket_start) on a miss."""
+        if not self.enabled:
+            return compute(timestamp)
+        bucket_start = self.bucket_start(timestamp)
+        value = self.get(source, version, bucket_start)
+        if value is None:
+            value = compute(bucket_start)
+            self.put(source, version, bucket_start, value)
+        return value
+
+    def precompute(self, source, version, predict, start_timestamp, n_buckets):
+        """Fill the next n_buckets buckets from start_timestamp with one vectorized predict call."""
+        if not self.enabled or n_buckets <= 0:
+            return 0
+        first = self.bucket_start(start_timestamp)
+        bucket_starts = first + self.bucket_seconds * np.arange(n_buckets, dtype=float)
+        for bucket_start, value in zip(bucket_starts, np.asarray(predict(bucket_starts), dtype=float).reshape(-1)):
+            self.put(source, version, float(bucket_start), float(value))
+        return n_buckets
+
+    def invalidate(self, source=None):
+        with self._lock:
+            if source is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == source]:
+                    del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+prediction_cache = PredictionCache(prediction_bucket_seconds, prediction_cache_size, prediction_cache_ttl)
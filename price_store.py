@@ -0,0 +1,338 @@
+import os
+import csv
+import json
+import shutil
+import logging
+import numpy as np
+import pandas as pd
+from config import price_store_format, price_store_csv_export
+from metrics import timed_function
+
+# Bytes read from the end of a CSV file per step when looking for its last row
+TAIL_BLOCK_SIZE = 4096
+
+# Number of npy generations kept on disk; older ones may still be memory-mapped by readers
+NPY_KEEP_GENERATIONS = 2
+
+# Tail segments appended to an npy generation before they are compacted into a new generation
+NPY_MAX_TAIL_SEGMENTS = 64
+
+
+def _npy_dir(data_path):
+    return f"{os.path.splitext(data_path)[0]}.cols"
+
+
+def _parquet_path(data_path):
+    return f"{os.path.splitext(data_path)[0]}.parquet"
+
+
+def primary_path(data_path):
+    """
+    Return the file that changes on every save of the price history for data_path.
+    """
+    if price_store_format == "npy":
+        return os.path.join(_npy_dir(data_path), "CURRENT")
+    if price_store_format == "parquet":
+        return _parquet_path(data_path)
+    return data_path
+
+
+def exists(data_path):
+    return os.path.exists(primary_path(data_path)) or os.path.exists(data_path)
+
+
+def _normalize(df):
+    """Return df with a "date" column instead of a "date" index."""
+    if "date" not in df.columns and df.index.name == "date":
+        df = df.reset_index()
+    return df
+
+
+def _save_npy(df, data_path):
+    base = _npy_dir(data_path)
+    os.makedirs(base, exist_ok=True)
+    current_path = os.path.join(base, "CURRENT")
+    generation = 0
+    if os.path.exists(current_path):
+        with open(current_path) as f:
+            generation = int(f.read().strip() or 0)
+    generation += 1
+
+    gen_dir = os.path.join(base, f"{generation:08d}")
+    shutil.rmtree(gen_dir, ignore_errors=True)
+    os.makedirs(gen_dir)
+    columns = []
+    for name in df.columns:
+        values = df[name]
+        if name == "date":
+            array = pd.to_datetime(values).values.astype("datetime64[ns]")
+        elif pd.api.types.is_numeric_dtype(values):
+            array = values.to_numpy()
+        else:
+            array = values.astype(str).to_numpy(dtype=str)
+        np.save(os.path.join(gen_dir, f"{name}.npy"), array, allow_pickle=False)
+        columns.append(name)
+    with open(os.path.join(gen_dir, "meta.json"), "w") as f:
+        json.dump({"columns": columns, "rows": len(df)}, f)
+
+    # Publish the new generation atomically, then drop old ones
+    tmp_path = f"{current_path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(generation))
+    os.replace(tmp_path, current_path)
+    for name in sorted(os.listdir(base)):
+        if name.isdigit() and int(name) <= generation - NPY_KEEP_GENERATIONS:
+            shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+
+
+def _npy_generation_dir(data_path):
+    base = _npy_dir(data_path)
+    with open(os.path.join(base, "CURRENT")) as f:
+        generation = int(f.read().strip())
+    return os.path.join(base, f"{generation:08d}")
+
+
+def _read_meta(gen_dir):
+    with open(os.path.join(gen_dir, "meta.json")) as f:
+        return json.load(f)
+
+
+def _npy_parts(gen_dir, meta):
+    """Directories holding the generation's rows in order: the generation itself, then its tail segments."""
+    return [gen_dir] + [os.path.join(gen_dir, segment["name"]) for segment in meta.get("segments", [])]
+
+
+def _load_npy(data_path, columns, tail_rows=None):
+    gen_dir = _npy_generation_dir(data_path)
+    meta = _read_meta(gen_dir)
+    names = meta["columns"] if columns is None else ["date"] + [c for c in columns if c != "date"]
+    for name in names:
+        if name not in meta["columns"]:
+            raise KeyError(name)
+
+    # Rows per part from the meta data, so only the parts holding the requested tail are opened
+    segments = meta.get("segments", [])
+    part_rows = [meta["rows"] - sum(segment["rows"] for segment in segments)] + [segment["rows"] for segment in segments]
+    parts = []
+    needed = meta["rows"] if tail_rows is None else min(tail_rows, meta["rows"])
+    for part, rows in reversed(list(zip(_npy_parts(gen_dir, meta), part_rows))):
+        if needed <= 0 and parts:
+            break
+        take = min(rows, max(needed, 0))
+        parts.insert(0, {
+            name: np.load(os.path.join(part, f"{name}.npy"), mmap_mode="r")[rows - take:] for name in names
+        })
+        needed -= take
+    # A single part stays memory-mapped
+    data = {name: parts[0][name] if len(parts) == 1 else np.concatenate([part[name] for part in parts]) for name in names}
+    return pd.DataFrame(data, copy=False)
+
+
+def _last_row_npy(data_path):
+    gen_dir = _npy_generation_dir(data_path)
+    meta = _read_meta(gen_dir)
+    if not meta["rows"]:
+        return None
+    part = _npy_parts(gen_dir, meta)[-1]
+    row = {}
+    for name in meta["columns"]:
+        value = np.load(os.path.join(part, f"{name}.npy"), mmap_mode="r")[-1]
+        row[name] = str(pd.Timestamp(value)) if name == "date" else value.item()
+    return row
+
+
+def _append_npy_tail(df, data_path):
+    """
+    Append rows that all follow the stored history as a new tail segment of
+    the current generation, writing only the new rows. Once the generation
+    has NPY_MAX_TAIL_SEGMENTS segments they are compacted with the new rows
+    into a new generation instead. Returns False when the rows do not have
+    the stored columns.
+    """
+    gen_dir = _npy_generation_dir(data_path)
+    meta = _read_meta(gen_dir)
+    segments = meta.get("segments", [])
+    if sorted(df.columns) != sorted(meta["columns"]):
+        return False
+    if len(segments) >= NPY_MAX_TAIL_SEGMENTS:
+        logging.info(f"Compacting {len(segments)} tail segments of {data_path}.")
+        existing = _load_npy(data_path, None)
+        _save_npy(pd.concat([existing, _cast_like(df, existing)], ignore_index=True)[meta["columns"]], data_path)
+        return True
+
+    name = f"tail-{len(segments) + 1:06d}"
+    segment_dir = os.path.join(gen_dir, name)
+    shutil.rmtree(segment_dir, ignore_errors=True)
+    os.makedirs(segment_dir)
+    for column in meta["columns"]:
+        stored = np.load(os.path.join(gen_dir, f"{column}.npy"), mmap_mode="r")
+        if column == "date":
+            array = pd.to_datetime(df[column]).values.astype("datetime64[ns]")
+        else:
+            array = df[column].to_numpy().astype(stored.dtype, copy=False)
+        np.save(os.path.join(segment_dir, f"{column}.npy"), array, allow_pickle=False)
+
+    # Readers see the segment once meta.json lists it; rewriting CURRENT marks the store as changed
+    meta = dict(meta, rows=meta["rows"] + len(df), segments=segments + [{"name": name, "rows": len(df)}])
+    tmp_path = os.path.join(gen_dir, "meta.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(gen_dir, "meta.json"))
+    current_path = os.path.join(_npy_dir(data_path), "CURRENT")
+    with open(f"{current_path}.tmp", "w") as f:
+        f.write(str(int(os.path.basename(gen_dir))))
+    os.replace(f"{current_path}.tmp", current_path)
+    return True
+
+
+def _save_parquet(df, data_path):
+    tmp_path = f"{_parquet_path(data_path)}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, _parquet_path(data_path))
+
+
+def _load_parquet(data_path, columns):
+    names = None if columns is None else ["date"] + [c for c in columns if c != "date"]
+    return pd.read_parquet(_parquet_path(data_path), columns=names)
+
+
+def _save_csv(df, data_path):
+    tmp_path = f"{data_path}.tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, data_path)
+
+
+def _load_csv(data_path, columns):
+    names = None if columns is None else ["date"] + [c for c in columns if c != "date"]
+    return pd.read_csv(data_path, usecols=names, parse_dates=["date"])
+
+
+def read_tail_row(data_path):
+    """Parse the header and the last line of a CSV file without reading the rest."""
+    with open(data_path, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8")]), None)
+        if not header:
+            return None
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        block = TAIL_BLOCK_SIZE
+        while True:
+            start = max(0, end - block)
+            f.seek(start)
+            lines = f.read(end - start).splitlines()
+            # The first line of the block may be cut off unless we reached the file start
+            complete = lines if start == 0 else lines[1:]
+            complete = [line for line in complete if line.strip()]
+            if complete or start == 0:
+                break
+            block *= 2
+
+    if not complete or (start == 0 and len(complete) == 1):
+        return None
+    values = next(csv.reader([complete[-1].decode("utf-8")]))
+    return dict(zip(header, values))
+
+
+def _cast_like(df, existing):
+    """Cast new rows to the dtypes of the stored columns, so appends keep compact float32/int32 columns."""
+    dtypes = {}
+    for name, dtype in existing.dtypes.items():
+        if name not in df.columns or df[name].dtype == dtype:
+            continue
+        if not (pd.api.types.is_numeric_dtype(dtype) and pd.api.types.is_numeric_dtype(df[name])):
+            continue
+        # Missing values cannot be stored in an integer column
+        if dtype.kind in "iu" and df[name].isna().any():
+            continue
+        dtypes[name] = dtype
+    return df.astype(dtypes) if dtypes else df
+
+
+@timed_function("save_prices")
+def save_prices(df, data_path):
+    """
+    Save price history (with a "date" column or index) for data_path using the
+    configured backend, plus the CSV export when enabled.
+    """
+    df = _normalize(df)
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+    if price_store_format == "npy":
+        _save_npy(df, data_path)
+    elif price_store_format == "parquet":
+        _save_parquet(df, data_path)
+    elif price_store_format != "csv":
+        raise ValueError(f"Price store format '{price_store_format}' not supported")
+    if price_store_format == "csv" or price_store_csv_export:
+        _save_csv(df, data_path)
+
+
+def _append_csv(df, data_path, columns):
+    df[columns].to_csv(data_path, mode="a", header=False, index=False)
+
+
+@timed_function("append_prices")
+def append_prices(df, data_path):
+    """
+    Merge new rows (with a "date" column or index) into the stored history
+    for data_path and save it. Rows replace stored rows with the same date.
+
+    With the npy store, rows that all come after the stored history (e.g.
+    streamed candles) are written as a tail segment and appended to the CSV
+    export, so the cost does not grow with the history (apart from a
+    compaction every NPY_MAX_TAIL_SEGMENTS appends). Returns the new rows
+    in that case, otherwise the merged frame.
+    """
+    df = _normalize(df)
+    if price_store_format == "npy" and os.path.exists(primary_path(data_path)) and not df.empty:
+        last = read_last_row(data_path)
+        dates = pd.to_datetime(df["date"])
+        if last is not None and dates.is_monotonic_increasing and dates.is_unique \
+                and dates.iloc[0] > pd.Timestamp(last["date"]) and _append_npy_tail(df, data_path):
+            if price_store_csv_export and os.path.exists(data_path):
+                _append_csv(df, data_path, list(last))
+            return df
+    if exists(data_path):
+        existing = load_prices(data_path)
+        df = pd.concat([existing, _cast_like(df, existing)], ignore_index=True)[list(existing.columns)]
+        df = df[~df["date"].duplicated(keep="last")].sort_values("date", kind="stable").reset_index(drop=True)
+    save_prices(df, data_path)
+    return df
+
+
+@timed_function("load_tail")
+def load_tail(data_path, rows, columns=None):
+    """
+    Load the last `rows` rows of the price history for data_path, reading
+    only the tail segments that hold them with the npy store.
+    """
+    if price_store_format == "npy" and os.path.exists(primary_path(data_path)):
+        return _load_npy(data_path, columns, tail_rows=rows)
+    return load_prices(data_path, columns).tail(rows).reset_index(drop=True)
+
+
+@timed_function("load_prices")
+def load_prices(data_path, columns=None):
+    """
+    Load price history for data_path as a DataFrame with a "date" column.
+
+    Only the requested columns (plus "date") are loaded. Falls back to the CSV
+    file when the configured store has not been written yet.
+    """
+    if price_store_format != "csv" and os.path.exists(primary_path(data_path)):
+        if price_store_format == "npy":
+            return _load_npy(data_path, columns)
+        return _load_parquet(data_path, columns)
+    if price_store_format != "csv":
+        logging.info(f"No {price_store_format} store for {data_path}, reading CSV.")
+    return _load_csv(data_path, columns)
+
+
+def read_last_row(data_path):
+    """Return the last stored row for data_path as a dict without loading the history."""
+    if price_store_format == "npy" and os.path.exists(primary_path(data_path)):
+        return _last_row_npy(data_path)
+    if price_store_format == "parquet" and os.path.exists(primary_path(data_path)):
+        return load_prices(data_path).tail(1).to_dict(orient="records")[0]
+    if not os.path.exists(data_path):
+        return None
+    return read_tail_row(data_path)
@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from urllib.parse import urlencode
+import requests
+from requests.adapters import HTTPAdapter
+from config import (
+    source_cache_path, source_cache_ttl, source_rate_limits, source_rate_burst,
+    download_timeout, download_retries, download_backoff,
+)
+from downloader import RETRY_STATUSES
+from metrics import SOURCE_REQUESTS
+
+
+class SourceError(Exception):
+    pass
+
+
+class RateLimiter:
+    """
+    Token bucket keeping one source within its request quota.
+
+    Up to `burst` requests go out immediately, after that requests are spaced
+    at the quota rate. A 429 response blocks the bucket for the server's
+    Retry-After delay, so concurrent callers wait instead of piling on.
+    """
+
+    def __init__(self, per_minute, burst=source_rate_burst):
+        self._rate = per_minute / 60.0
+        self._capacity = max(1.0, min(float(burst), float(per_minute)))
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self._rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                wait = self._blocked_until - now
+                if wait <= 0 and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(wait, (1 - self._tokens) / self._rate)
+            time.sleep(wait)
+
+    def block(self, seconds):
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+class ResponseCache:
+    """On-disk cache of JSON responses with their ETag and Last-Modified validators."""
+
+    def __init__(self, base_path):
+        self._base_path = base_path
+
+    def _path(self, key):
+        return os.path.join(self._base_path, f"{hashlib.sha256(key.encode()).hexdigest()[:32]}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return entry if entry.get("key") == key else None
+
+    def put(self, key, entry):
+        os.makedirs(self._base_path, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(dict(entry, key=key), f)
+        os.replace(tmp_path, path)
+
+
+class SourceClient:
+    """
+    GET JSON from the REST price sources through pooled connections, a
+    per-source rate limiter and a response cache.
+
+    A cached response younger than the TTL is returned without a request;
+    an older one is revalidated with If-None-Match / If-Modified-Since, and a
+    304 answer reuses the cached body. 429/5xx responses and connection errors
+    are retried with exponential backoff, honouring Retry-After.
+    """
+
+    def __init__(self, cache_path=source_cache_path, ttl=source_cache_ttl, rate_limits=source_rate_limits,
+                 timeout=download_timeout, retries=download_retries, backoff=download_backoff):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._cache = ResponseCache(cache_path)
+        self._rate_limits = rate_limits
+        self._limiters = {}
+        self._limiters_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _session(self):
+        # One pooled session per thread, as in the archive downloader
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+        return session
+
+    def _limiter(self, source):
+        with self._limiters_lock:
+            limiter = self._limiters.get(source)
+            if limiter is None:
+                limiter = self._limiters[source] = RateLimiter(self._rate_limits.get(source, 0))
+            return limiter
+
+    def get_json(self, source, url, params=None, headers=None, ttl=None):
+        """Return the decoded JSON body of GET url?params; API keys in headers are not cached."""
+        key = f"{url}?{urlencode(sorted((params or {}).items()))}"
+        ttl = self.ttl if ttl is None else ttl
+        entry = self._cache.get(key)
+        if entry is not None and time.time() - entry["fetched_at"] < ttl:
+            SOURCE_REQUESTS.inc(source=source, result="cache")
+            return json.loads(entry["body"])
+
+        request_headers = dict(headers or {})
+        if entry is not None:
+            if entry.get("etag"):
+                request_headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                request_headers["If-Modified-Since"] = entry["last_modified"]
+
+        limiter = self._limiter(source)
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * (2 ** attempt)
+            limiter.acquire()
+            try:
+                response = self._session().get(url, params=params, headers=request_headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.retries:
+                    SOURCE_REQUESTS.inc(source=source, result="error")
+                    raise SourceError(f"Failed to retrieve data from {source}: {e}") from e
+                logging.warning(f"Request to {source} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            if response.status_code == 304 and entry is not None:
+                entry["fetched_at"] = time.time()
+                self._cache.put(key, entry)
+                SOURCE_REQUESTS.inc(source=source, result="not_modified")
+                return json.loads(entry["body"])
+
+            if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                retry_after = response.headers.get("Retry-After")
+                if retry_after and retry_after.isdigit():
+                    delay = float(retry_after)
+                logging.warning(f"HTTP {response.status_code} from {source}, retrying in {delay:.1f}s")
+                if response.status_code == 429:
+                    limiter.block(delay)
+                else:
+                    time.sleep(delay)
+                continue
+
+            if response.status_code != 200:
+                SOURCE_REQUESTS.inc(source=source, result="error")
+                raise SourceError(f"Failed to retrieve data from {source}: HTTP {response.status_code} {response.text}")
+
+            self._cache.put(key, {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched_at": time.time(),
+                "body": response.text,
+            })
+            SOURCE_REQUESTS.inc(source=source, result="fetched")
+            return response.json()
+
+
+source_client = SourceClient()
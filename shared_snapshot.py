@@ -0,0 +1,227 @@
+import os
+import json
+import struct
+import threading
+import time
+import logging
+import numpy as np
+from config import shared_snapshot_path, model_reload_interval
+from backends import load_model, model_from_artifact
+
+# File layout: magic, header length (uint64), JSON header, padding, then the float64 arrays
+SNAPSHOT_MAGIC = b"MODELSNP"
+SNAPSHOT_ALIGN = 64
+
+# Number of snapshot generations kept on disk; older ones may still be mapped by workers
+SNAPSHOT_KEEP_GENERATIONS = 2
+
+_ARRAY_KEY = "__array__"
+
+
+def _snapshot_file(base_path, generation):
+    return os.path.join(base_path, f"snapshot-{generation:08d}.bin")
+
+
+def _read_generation(base_path):
+    try:
+        with open(os.path.join(base_path, "CURRENT")) as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def _encode(value, arrays, offset):
+    """
+    Replace numeric lists in an artifact with references into the array
+    region. Returns (encoded value, next offset).
+    """
+    if isinstance(value, dict):
+        encoded = {}
+        for key, item in value.items():
+            encoded[key], offset = _encode(item, arrays, offset)
+        return encoded, offset
+    if isinstance(value, (list, tuple)) and value:
+        array = np.asarray(value)
+        if array.dtype.kind in "biuf":
+            array = np.ascontiguousarray(array, dtype=np.float64)
+            arrays.append(array)
+            return {_ARRAY_KEY: [offset, list(array.shape)]}, offset + array.nbytes
+    return value, offset
+
+
+def _decode(value, buffer, data_start):
+    """Turn array references back into read-only float64 views of the mapped file."""
+    if isinstance(value, dict):
+        if _ARRAY_KEY in value:
+            offset, shape = value[_ARRAY_KEY]
+            count = int(np.prod(shape))
+            view = np.frombuffer(buffer, dtype=np.float64, count=count, offset=data_start + offset)
+            return view.reshape(shape)
+        return {key: _decode(item, buffer, data_start) for key, item in value.items()}
+    return value
+
+
+def publish(models, base_path=shared_snapshot_path, versions=None):
+    """
+    Write the given models ({asset key: model}) as the next snapshot
+    generation and return the generation number. `versions` records the
+    (mtime_ns, size) of each model's artifact file, so readers can tell when
+    the file was rewritten after publishing.
+
+    The file is written under a temporary name and renamed into place before
+    CURRENT is switched to it, so workers only ever attach complete snapshots.
+    """
+    os.makedirs(base_path, exist_ok=True)
+    generation = _read_generation(base_path) + 1
+
+    arrays = []
+    offset = 0
+    assets = {}
+    for key, model in models.items():
+        assets[key], offset = _encode(model.to_artifact(), arrays, offset)
+    header = {"generation": generation, "assets": assets, "versions": versions or {}}
+    header = json.dumps(header, separators=(",", ":")).encode()
+    data_start = -(-(len(SNAPSHOT_MAGIC) + 8 + len(header)) // SNAPSHOT_ALIGN) * SNAPSHOT_ALIGN
+
+    path = _snapshot_file(base_path, generation)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        f.write(b"\0" * (data_start - f.tell()))
+        for array in arrays:
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+
+    current_path = os.path.join(base_path, "CURRENT")
+    with open(f"{current_path}.tmp", "w") as f:
+        f.write(str(generation))
+    os.replace(f"{current_path}.tmp", current_path)
+
+    # Unlinked files stay valid for workers that still have them mapped
+    for name in os.listdir(base_path):
+        if name.startswith("snapshot-") and name.endswith(".bin"):
+            if int(name[len("snapshot-"):-len(".bin")]) <= generation - SNAPSHOT_KEEP_GENERATIONS:
+                os.remove(os.path.join(base_path, name))
+
+    logging.info(f"Published model snapshot generation {generation} with {len(models)} models ({offset} bytes of arrays)")
+    return generation
+
+
+def publish_catalog(catalog, base_path=shared_snapshot_path):
+    """Publish the trained model of every catalog asset that has one; returns the generation."""
+    models = {}
+    versions = {}
+    for key, asset in catalog.items():
+        try:
+            # Stat before loading: a file replaced in between then looks newer than its snapshot copy
+            versions[key] = artifact_version(asset["model_path"])
+            models[key] = load_model(asset["model_path"])
+        except (FileNotFoundError, ValueError, KeyError) as e:
+            versions.pop(key, None)
+            logging.warning(f"Leaving {key} out of the model snapshot: {e}")
+    return publish(models, base_path, versions)
+
+
+def artifact_version(path):
+    """(mtime_ns, size) of a model artifact file, as recorded in the snapshot."""
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class SharedSnapshot:
+    """
+    Read side of the model snapshot, one per worker process.
+
+    The snapshot file is memory-mapped read-only, so the model parameters are
+    shared through the page cache by all workers instead of being parsed into
+    each one. CURRENT is re-read at most every `check_interval` seconds; when
+    its generation changes the new file is mapped and swapped in for all
+    assets at once. Models are built lazily from views into the mapping.
+    """
+
+    def __init__(self, base_path=shared_snapshot_path, check_interval=1.0):
+        self._base_path = base_path
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        self._current = None
+        self._checked_at = 0.0
+        # Set once CURRENT has been read; lookups with check=False never read it again
+        self._loaded = False
+
+    def _attach(self, generation):
+        buffer = np.memmap(_snapshot_file(self._base_path, generation), dtype=np.uint8, mode="r")
+        if bytes(buffer[:len(SNAPSHOT_MAGIC)]) != SNAPSHOT_MAGIC:
+            raise ValueError(f"Model snapshot generation {generation} is not a snapshot file")
+        header_length = struct.unpack("<Q", bytes(buffer[len(SNAPSHOT_MAGIC):len(SNAPSHOT_MAGIC) + 8]))[0]
+        header_start = len(SNAPSHOT_MAGIC) + 8
+        header = json.loads(bytes(buffer[header_start:header_start + header_length]))
+        data_start = -(-(header_start + header_length) // SNAPSHOT_ALIGN) * SNAPSHOT_ALIGN
+        return {
+            "generation": generation,
+            "buffer": buffer,
+            "data_start": data_start,
+            "assets": header["assets"],
+            "versions": header.get("versions", {}),
+            "models": {},
+        }
+
+    def _snapshot(self, check=True):
+        current = self._current
+        if self._loaded and (not check or time.monotonic() - self._checked_at < self._check_interval):
+            return current
+        with self._lock:
+            generation = _read_generation(self._base_path)
+            if generation and (self._current is None or self._current["generation"] != generation):
+                try:
+                    self._current = self._attach(generation)
+                    logging.info(f"Attached model snapshot generation {generation}")
+                except (OSError, ValueError) as e:
+                    logging.error(f"Attaching model snapshot generation {generation} failed: {e}")
+            self._checked_at = time.monotonic()
+            self._loaded = True
+            return self._current
+
+    def generation(self):
+        current = self._snapshot()
+        return current["generation"] if current is not None else 0
+
+    def get(self, key, check=True):
+        """
+        Return (("snapshot", generation), model) for an asset, or None if it is
+        not published. With check=False the attached generation is used as is.
+        """
+        current = self._snapshot(check)
+        if current is None or key not in current["assets"]:
+            return None
+        model = current["models"].get(key)
+        if model is None:
+            with self._lock:
+                model = current["models"].get(key)
+                if model is None:
+                    artifact = _decode(current["assets"][key], current["buffer"], current["data_start"])
+                    model = model_from_artifact(artifact, f"snapshot generation {current['generation']}")
+                    current["models"][key] = model
+        return ("snapshot", current["generation"]), model
+
+    def in_memory(self, key):
+        """
+        Whether get(key, check=False) is answered without reading a file:
+        None if CURRENT was never read, else whether the asset is published.
+        """
+        if not self._loaded:
+            return None
+        return self._current is not None and key in self._current["assets"]
+
+    def published_version(self, key, check=True):
+        """The artifact file version an asset's model was published from, or None if unknown."""
+        current = self._snapshot(check)
+        return current["versions"].get(key) if current is not None else None
+
+    def invalidate(self):
+        """Force the next lookup to re-read the current generation."""
+        self._checked_at = 0.0
+
+
+shared_snapshot = SharedSnapshot(shared_snapshot_path, model_reload_interval)
@@ -0,0 +1,346 @@
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+import pandas as pd
+from updater import plan_binance_archives, download_binance_archives, monthly_archive_name
+from latest_store import record_latest, get_latest
+from rest_sources import source_client, SourceError
+from kline_parser import read_archives
+from config import format_workers
+from aggregates import new_bars, store_bars
+import price_store
+
+COINGECKO_API_URL = "https://api.coingecko.com/api/v3"
+CMC_API_URL = "https://sandbox-api.coinmarketcap.com/v1"
+PORTALSFI_API_URL = "https://api.portals.fi/v2"
+
+# Days of CoinGecko history fetched for an asset with no stored prices
+COINGECKO_INITIAL_DAYS = 30
+
+# Registered source plugins by source name
+source_plugins = {}
+
+
+def register_source(plugin_class):
+    """Class decorator registering a source plugin under its `name`."""
+    source_plugins[plugin_class.name] = plugin_class()
+    return plugin_class
+
+
+def get_source(name):
+    try:
+        return source_plugins[name]
+    except KeyError:
+        raise ValueError(f"Unknown source '{name}'") from None
+
+
+def plugin_for(asset):
+    """The plugin updating an asset: the aggregate plugin for derived resolutions, else its source's."""
+    return source_plugins["aggregate"] if asset.get("aggregate_from") else get_source(asset["source"])
+
+
+class SourcePlugin:
+    """
+    A price data source. Updating an asset runs four steps:
+
+    plan(asset) works out what is missing locally (None when nothing is),
+    fetch(asset, plan) downloads it, parse(asset, raw) turns it into a price
+    frame and append(asset, parsed) merges that into the asset's price store.
+    Sources that only report the latest price set keeps_history = False and
+    replace the store instead.
+    """
+
+    name = None
+    keeps_history = True
+
+    def plan(self, asset):
+        return None
+
+    def fetch(self, asset, plan):
+        raise NotImplementedError
+
+    def parse(self, asset, raw):
+        raise NotImplementedError
+
+    def append(self, asset, parsed):
+        if parsed is None or parsed.empty:
+            return
+        data_path = asset["data_path"]
+        if self.keeps_history:
+            stored = price_store.append_prices(parsed, data_path)
+        else:
+            price_store.save_prices(parsed, data_path)
+            stored = parsed
+        record_latest(data_path, stored)
+        logging.info(f"Stored {len(parsed)} {self.name} rows for {asset['key']} in {data_path}.")
+
+    def download(self, asset):
+        """Plan and fetch; returns the raw data for parse."""
+        return self.fetch(asset, self.plan(asset))
+
+    def store(self, asset, raw):
+        """Parse and append the raw data returned by download."""
+        self.append(asset, self.parse(asset, raw))
+
+    def update(self, asset):
+        self.store(asset, self.download(asset))
+
+
+def _file_checksum(file_path):
+    """
+    Return the SHA-256 hex digest of a file.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _load_binance_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except ValueError:
+        logging.warning(f"Ignoring unreadable manifest {manifest_path}.")
+        return {}
+
+
+def _save_binance_manifest(manifest_path, manifest):
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+@register_source
+class BinanceSource(SourcePlugin):
+    """Binance futures kline archives from data.binance.vision."""
+
+    name = "binance"
+
+    def plan(self, asset):
+        """The missing (monthly, daily) archive names, or None when nothing is missing."""
+        archive_path = asset["archive_path"]
+        existing_files = os.listdir(archive_path) if os.path.isdir(archive_path) else []
+        monthly, daily = plan_binance_archives(
+            asset["symbol"], asset["interval"], asset["listing_date"], datetime.utcnow().date(), existing_files
+        )
+        return (monthly, daily) if monthly or daily else None
+
+    def fetch(self, asset, plan):
+        # Archives are downloaded next to the ones already present; parse reads them from there
+        if plan:
+            monthly, daily = plan
+            download_binance_archives(
+                asset["market"], asset["symbol"], asset["interval"], monthly, daily, asset["archive_path"]
+            )
+            logging.info(f"Downloaded Binance data to {asset['archive_path']}.")
+        return asset["archive_path"]
+
+    def parse(self, asset, raw, incremental=True):
+        """
+        Read the archives of an asset that are new or changed since the last run.
+
+        In incremental mode only archives that are not yet listed in the manifest
+        (or whose size/checksum changed) are parsed. Daily archives are skipped
+        once the monthly archive for the same month is present. All archives are
+        read (a rebuild) when there is no consolidated file yet or a previously
+        ingested archive was removed. Returns None when nothing changed.
+        """
+        archive_path = raw
+        data_path = asset["data_path"]
+        manifest_path = os.path.join(archive_path, "manifest.json")
+        files = sorted(x for x in os.listdir(archive_path) if x.endswith(".zip")) if os.path.isdir(archive_path) else []
+
+        # Exit if no files to process
+        if not files:
+            logging.warning("No data files found to process.")
+            return None
+
+        # Daily archives are superseded by the monthly archive of the same month
+        file_set = set(files)
+        files = [file for file in files if monthly_archive_name(file) not in file_set]
+
+        manifest = _load_binance_manifest(manifest_path) if incremental and price_store.exists(data_path) else {}
+        removed = [
+            file for file in manifest
+            if file not in file_set and monthly_archive_name(file) not in file_set
+        ]
+        if removed:
+            logging.info(f"{len(removed)} ingested archives were removed, rebuilding {asset['key']}.")
+            manifest = {}
+
+        new_manifest = {}
+        changed = []
+        for file in files:
+            zip_file_path = os.path.join(archive_path, file)
+            stat = os.stat(zip_file_path)
+            entry = manifest.get(file)
+            if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                new_manifest[file] = entry
+                continue
+
+            checksum = _file_checksum(zip_file_path)
+            if entry and entry["size"] == stat.st_size and entry["sha256"] == checksum:
+                new_manifest[file] = dict(entry, mtime_ns=stat.st_mtime_ns)
+                continue
+
+            changed.append(zip_file_path)
+            new_manifest[file] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": checksum}
+
+        if manifest and not changed:
+            if new_manifest != manifest:
+                _save_binance_manifest(manifest_path, new_manifest)
+            logging.info(f"{asset['key']} is up to date, no new archives to format.")
+            return None
+
+        # One preallocated frame for all archives; rows from newer archives replace overlapping older rows
+        price_df = read_archives(changed, workers=format_workers)
+        # Consecutive archives are usually already in order without overlaps
+        if not (price_df.index.is_monotonic_increasing and price_df.index.is_unique):
+            price_df = price_df[~price_df.index.duplicated(keep="last")].sort_index()
+        return {"prices": price_df, "manifest": new_manifest, "archives": len(changed), "rebuild": not manifest}
+
+    def append(self, asset, parsed):
+        if parsed is None:
+            return
+        data_path = asset["data_path"]
+        if parsed["rebuild"]:
+            price_store.save_prices(parsed["prices"], data_path)
+            stored = parsed["prices"]
+        else:
+            logging.info(f"Merging {parsed['archives']} new or changed archives into {data_path}.")
+            stored = price_store.append_prices(parsed["prices"], data_path)
+        record_latest(data_path, stored)
+        _save_binance_manifest(os.path.join(asset["archive_path"], "manifest.json"), parsed["manifest"])
+        logging.info(f"Formatted data saved to {data_path}.")
+
+
+def _last_stored_date(data_path):
+    latest = get_latest(data_path)
+    if not latest or latest.get("date") is None:
+        return None
+    return pd.Timestamp(latest["date"])
+
+
+@register_source
+class CoinGeckoSource(SourcePlugin):
+    """Daily CoinGecko prices; the asset symbol is the CoinGecko coin id."""
+
+    name = "coingecko"
+
+    def plan(self, asset):
+        """The (start, end) day range missing from the store; today's incomplete day is left out."""
+        today = pd.Timestamp.now(tz="UTC").normalize().tz_localize(None)
+        last_date = _last_stored_date(asset["data_path"])
+        if last_date is None:
+            start = today - pd.Timedelta(days=COINGECKO_INITIAL_DAYS)
+        else:
+            start = last_date.normalize() + pd.Timedelta(days=1)
+        if start >= today:
+            logging.info(f"CoinGecko data for {asset['key']} is up to date.")
+            return None
+        return start, today
+
+    def fetch(self, asset, plan):
+        if plan is None:
+            return None
+        start, end = plan
+        data = source_client.get_json(
+            "coingecko", f"{COINGECKO_API_URL}/coins/{asset['symbol']}/market_chart/range",
+            params={"vs_currency": "usd", "from": int(start.timestamp()), "to": int(end.timestamp())},
+            headers={
+                "accept": "application/json",
+                "x-cg-demo-api-key": "CG-HERE"  # replace with your API key
+            },
+        )
+        return {"start": start, "end": end, "prices": data["prices"]}
+
+    def parse(self, asset, raw):
+        if raw is None:
+            return None
+        df = pd.DataFrame(raw["prices"], columns=["date", "price"])
+        df["date"] = pd.to_datetime(df["date"], unit="ms")
+        # Short ranges come back hourly; keep the first price of each complete day, as the daily series does
+        df = df[(df["date"] >= raw["start"]) & (df["date"] < raw["end"])]
+        df = df.groupby(df["date"].dt.normalize(), sort=True)["price"].first().reset_index()
+        if df.empty:
+            logging.info(f"No new CoinGecko data for {asset['key']} since {raw['start'].date()}.")
+        return df
+
+
+@register_source
+class CMCSource(SourcePlugin):
+    """Latest CoinMarketCap quote of the asset symbol."""
+
+    name = "cmc"
+    keeps_history = False
+
+    def fetch(self, asset, plan):
+        return source_client.get_json(
+            "cmc", f"{CMC_API_URL}/cryptocurrency/quotes/latest",
+            params={"symbol": asset["symbol"], "convert": "USD"},
+            headers={
+              'Accepts': 'application/json',
+              'X-CMC_PRO_API_KEY': 'HERE',  # replace with your API key
+            },
+        )
+
+    def parse(self, asset, raw):
+        token_data = raw["data"].get(asset["symbol"])
+        if token_data is None:
+            raise SourceError(f"CoinMarketCap returned no quote for {asset['symbol']}")
+        quote = token_data["quote"]["USD"]
+        date = pd.Timestamp(quote["last_updated"]).tz_localize(None) if quote.get("last_updated") else datetime.now()
+        return pd.DataFrame([{"date": date, "price": quote["price"]}])
+
+
+@register_source
+class PortalsfiSource(SourcePlugin):
+    """Latest Portals.fi price of the asset symbol."""
+
+    name = "portalsfi"
+    keeps_history = False
+
+    def fetch(self, asset, plan):
+        return source_client.get_json(
+            "portalsfi", f"{PORTALSFI_API_URL}/tokens",
+            params={"search": asset["symbol"].lower(), "platforms": "native", "networks": "ethereum"},
+            headers={
+                "Authorization": "HERE" # replace with your API key
+            },
+        )
+
+    def parse(self, asset, raw):
+        token_data = next((item for item in raw if item['symbol'].upper() == asset['symbol'].upper()), None)
+        if token_data is None:
+            raise SourceError(f"Portals.fi returned no token {asset['symbol']}")
+        return pd.DataFrame([{
+            "date": datetime.now(),
+            "price": token_data['price_usd']
+        }])
+
+
+@register_source
+class AggregateSource(SourcePlugin):
+    """
+    Bars of a derived resolution, aggregated from the base asset's price
+    store (see aggregates.py) instead of downloaded.
+    """
+
+    name = "aggregate"
+
+    def fetch(self, asset, plan):
+        return asset["base_data_path"]
+
+    def parse(self, asset, raw):
+        return new_bars(raw, asset["data_path"], asset["interval"])
+
+    def append(self, asset, parsed):
+        count = store_bars(asset["data_path"], parsed)
+        logging.info(f"Aggregated {count} new {asset['interval']} bars for {asset['key']} from {asset['base_key']}.")
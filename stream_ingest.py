@@ -0,0 +1,199 @@
+"""
+Streaming ingestion of closed Binance klines into the price store.
+
+    python stream_ingest.py                                 # live Binance futures kline stream
+    python stream_ingest.py --replay klines.jsonl --speed 0  # replay recorded stream messages offline
+"""
+import json
+import time
+import argparse
+import logging
+from collections import defaultdict
+import pandas as pd
+from config import (
+    binance_stream_url, stream_flush_interval, stream_reconnect_delay, shared_snapshot_enabled,
+)
+from assets import catalog, derived_assets
+from aggregates import update_aggregate
+from latest_store import record_latest
+from update_coordinator import update_coordinator
+from shared_snapshot import publish_catalog
+from model import train_model
+from metrics import timed
+import price_store
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Kline fields of a Binance stream message mapped to the columns of the formatted archives
+KLINE_COLUMNS = {
+    "start_time": "t", "open": "o", "high": "h", "low": "l", "close": "c", "volume": "v",
+    "end_time": "T", "volume_usd": "q", "n_trades": "n", "taker_volume": "V", "taker_volume_usd": "Q",
+}
+INTEGER_COLUMNS = ("start_time", "end_time", "n_trades")
+
+
+def stream_name(asset):
+    return f"{asset['symbol'].lower()}@kline_{asset['interval']}"
+
+
+def parse_kline(message):
+    """
+    Return (symbol, interval, candle) for a closed kline in a Binance stream
+    message (raw or combined-stream envelope), or None for anything else.
+    The candle has the columns of the formatted archives plus "date".
+    """
+    data = message.get("data", message)
+    kline = data.get("k")
+    if data.get("e") != "kline" or not kline or not kline.get("x"):
+        return None
+    candle = {
+        column: int(kline[field]) if column in INTEGER_COLUMNS else float(kline[field])
+        for column, field in KLINE_COLUMNS.items()
+    }
+    candle["date"] = pd.to_datetime(candle["end_time"], unit="ms")
+    return kline["s"].upper(), kline["i"], candle
+
+
+def replay_messages(path, speed=0.0):
+    """
+    Yield stream messages recorded one JSON object per line. With speed > 0
+    the gaps between event times are replayed, divided by speed.
+    """
+    previous = None
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            message = json.loads(line)
+            event_time = message.get("data", message).get("E")
+            if speed > 0 and previous is not None and event_time is not None:
+                time.sleep(max(0.0, (event_time - previous) / 1000.0 / speed))
+            previous = event_time if event_time is not None else previous
+            yield message
+
+
+def binance_messages(streams, base_url=binance_stream_url, reconnect_delay=stream_reconnect_delay):
+    """Yield messages from the Binance combined kline stream, reconnecting after errors."""
+    try:
+        import websocket
+    except ImportError as e:
+        raise ImportError("Live streaming requires 'websocket-client', install it with pip install websocket-client") from e
+
+    url = f"{base_url}/stream?streams={'/'.join(streams)}"
+    while True:
+        connection = None
+        try:
+            connection = websocket.create_connection(url, timeout=60)
+            logging.info(f"Connected to {url}")
+            while True:
+                yield json.loads(connection.recv())
+        except (websocket.WebSocketException, OSError, ValueError) as e:
+            logging.warning(f"Kline stream interrupted ({e}), reconnecting in {reconnect_delay}s")
+        finally:
+            if connection is not None:
+                connection.close()
+        time.sleep(reconnect_delay)
+
+
+class StreamIngestor:
+    """
+    Buffers closed candles per asset and periodically merges them into the
+    price store, then updates the asset's model incrementally.
+
+    Writes take the update lock without waiting; while a batch update holds it
+    candles stay buffered and are written on a later flush.
+    """
+
+    def __init__(self, assets, flush_interval=stream_flush_interval):
+        self._assets = {(asset["symbol"].upper(), asset["interval"]): asset for asset in assets}
+        self._flush_interval = flush_interval
+        self._buffers = defaultdict(list)
+        self._flushed_at = time.monotonic()
+        self.candles = 0
+
+    def streams(self):
+        return [stream_name(asset) for asset in self._assets.values()]
+
+    def handle(self, message):
+        parsed = parse_kline(message)
+        if parsed is None:
+            return
+        symbol, interval, candle = parsed
+        asset = self._assets.get((symbol, interval))
+        if asset is None:
+            return
+        self._buffers[asset["key"]].append(candle)
+        self.candles += 1
+
+    def flush(self, force=False):
+        """Write buffered candles and refresh models; returns the number of assets updated."""
+        if not self._buffers or (not force and time.monotonic() - self._flushed_at < self._flush_interval):
+            return 0
+        with update_coordinator.try_locked() as locked:
+            if not locked:
+                logging.info("Update running, keeping streamed candles buffered.")
+                return 0
+            updated = 0
+            for key, candles in list(self._buffers.items()):
+                asset = catalog[key]
+                start = time.perf_counter()
+                try:
+                    with timed("stream_flush", key):
+                        df = price_store.append_prices(pd.DataFrame(candles), asset["data_path"])
+                        record_latest(asset["data_path"], df)
+                        train_model(asset["data_path"], asset["model_path"], new_rows=len(candles))
+                except Exception as e:
+                    logging.error(f"Streaming update of {key} failed: {e}")
+                    continue
+                self._update_derived(key)
+                del self._buffers[key]
+                updated += 1
+                logging.info(f"Appended {len(candles)} streamed candles to {key} in {time.perf_counter() - start:.3f}s")
+            if updated and shared_snapshot_enabled:
+                publish_catalog(catalog)
+        self._flushed_at = time.monotonic()
+        return updated
+
+    def _update_derived(self, key):
+        """Aggregate the coarser resolutions of a base asset and retrain those that got new bars."""
+        for derived in derived_assets(key):
+            try:
+                with timed("stream_flush", derived["key"]):
+                    count = update_aggregate(derived["base_data_path"], derived["data_path"], derived["interval"])
+                    if count:
+                        train_model(derived["data_path"], derived["model_path"], new_rows=count)
+            except Exception as e:
+                logging.error(f"Streaming update of {derived['key']} failed: {e}")
+
+    def run(self, messages):
+        try:
+            for message in messages:
+                self.handle(message)
+                self.flush()
+        finally:
+            self.flush(force=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--replay", help="JSONL file of recorded stream messages to ingest instead of the live stream")
+    parser.add_argument("--speed", type=float, default=0.0, help="replay speed-up factor; 0 replays without waiting")
+    args = parser.parse_args()
+
+    # Aggregated resolutions are not streamed; they are rebuilt from their base asset
+    assets = [asset for asset in catalog.values() if asset["source"] == "binance" and not asset.get("aggregate_from")]
+    if not assets:
+        logging.error("No Binance assets in the catalog to stream.")
+        return
+    ingestor = StreamIngestor(assets)
+    if args.replay:
+        messages = replay_messages(args.replay, args.speed)
+    else:
+        messages = binance_messages(ingestor.streams())
+    ingestor.run(messages)
+    logging.info(f"Ingested {ingestor.candles} closed candles.")
+
+
+if __name__ == "__main__":
+    main()
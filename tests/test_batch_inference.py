@@ -0,0 +1,22 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+
+
+def test_batch_inference_rejects_non_object_body():
+    response = app.test_client().post("/inference/batch", json=[1, 2])
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "request body must be a JSON object"}
+
+
+def test_batch_inference_rejects_invalid_json():
+    response = app.test_client().post("/inference/batch", data="{not json", content_type="application/json")
+    assert response.status_code == 400
+
+
+def test_batch_inference_rejects_string_sources():
+    response = app.test_client().post("/inference/batch", json={"sources": "binance"})
+    assert response.status_code == 400
@@ -1,8 +1,8 @@
 import os
+import sys
+import time
 import requests
 import logging
-from updater import download_binance_monthly_data, download_binance_daily_data, download_coingecko_data, download_cmc_data, download_portalsfi_data
-from datetime import datetime
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -14,44 +14,56 @@ if not INFERENCE_ADDRESS:
     logging.error("INFERENCE_API_ADDRESS environment variable not set.")
     exit(1)
 
+# Seconds between /update/status polls and the longest wait for the update job to finish
+UPDATE_POLL_INTERVAL = float(os.getenv("UPDATE_POLL_INTERVAL", "5"))
+UPDATE_WAIT_TIMEOUT = float(os.getenv("UPDATE_WAIT_TIMEOUT", "3600"))
+
 update_url = f"{INFERENCE_ADDRESS}/update"
+status_url = f"{INFERENCE_ADDRESS}/update/status"
 
-logging.info("UPDATING INFERENCE WORKER DATA")
-
-try:
-    response = requests.get(update_url)
-    response.raise_for_status()
-
-    content = response.text
-
-    if content == "0":
-        logging.info("Update signal received: Proceeding with data update")
-        
-        # Binance data
-        logging.info("Starting download of Binance data...")
-        binance_data_path = os.path.join("data", "binance/futures-klines")
-        download_binance_monthly_data("um", ["ETHUSDT"], ["1d"], ["2018", "2019", "2020", "2021", "2022", "2023", "2024"], ["01", "02", "03", "04", "05", "06", "07", "08", "09", "10", "11", "12"], binance_data_path)
-        current_year = datetime.now().year
-        current_month = datetime.now().month
-        download_binance_daily_data("um", ["ETHUSDT"], ["1d"], current_year, current_month, binance_data_path)
-
-        # CoinGecko data
-        logging.info("Starting download of CoinGecko data...")
-        download_coingecko_data()
-
-        # CoinMarketCap data
-        logging.info("Starting download of CoinMarketCap data...")
-        download_cmc_data()
-
-        # Portals.fi data
-        logging.info("Starting download of Portals.fi data...")
-        download_portalsfi_data()
-
-        logging.info("Data update process completed successfully")
-        exit(0)
-    else:
-        logging.error("Update signal not received: Response content is not '0'")
-        exit(1)
-except requests.RequestException as e:
-    logging.error(f"Request to update endpoint failed with error: {e}")
-    exit(1)
+
+def wait_for_job(job_id):
+    """
+    Poll /update/status until the job is no longer running; returns its final status.
+    Raises RuntimeError if the status already belongs to another job.
+    """
+    deadline = time.monotonic() + UPDATE_WAIT_TIMEOUT
+    while True:
+        response = requests.get(status_url, timeout=30)
+        response.raise_for_status()
+        status = response.json()
+        if status.get("state") != "running":
+            if job_id is not None and status.get("job_id") != job_id:
+                raise RuntimeError(f"Update job {job_id} was replaced by job {status.get('job_id')} before its status could be read")
+            return status
+        progress = status.get("progress") or {}
+        logging.info(f"Update job {status.get('job_id')} running: {progress.get('percent', 0.0)}% of stages done")
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Update job {job_id} still running after {UPDATE_WAIT_TIMEOUT}s")
+        time.sleep(UPDATE_POLL_INTERVAL)
+
+
+if __name__ == "__main__":
+    logging.info("UPDATING INFERENCE WORKER DATA")
+
+    # The inference service downloads, formats and trains every catalog asset in
+    # one job; this only triggers it (or joins the running one) and waits for it
+    try:
+        response = requests.get(update_url, timeout=30)
+        response.raise_for_status()
+        job = response.json()
+        logging.info(f"Update signal received: {job.get('status')} (job {job.get('job_id')})")
+
+        status = wait_for_job(job.get("job_id"))
+    except (requests.RequestException, ValueError, TimeoutError, RuntimeError) as e:
+        logging.error(f"Update request failed with error: {e}")
+        sys.exit(1)
+
+    failed = {key: entry for key, entry in (status.get("sources") or {}).items() if entry.get("status") != "ok"}
+    for key, entry in failed.items():
+        logging.error(f"{key} update {entry.get('status')}: {entry.get('error')}")
+    if status.get("state") != "completed":
+        logging.error(f"Update job {status.get('job_id')} {status.get('state')}: {status.get('error')}")
+        sys.exit(1)
+    logging.info(f"Data update process completed, {len(failed)} assets failed")
+    sys.exit(0)
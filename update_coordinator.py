@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import uuid
+import fcntl
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from config import update_lock_path, update_status_path
+
+
+# How long a trigger waits for a short write outside a job (e.g. a stream flush) to release the lock
+TRIGGER_WAIT_SECONDS = 30.0
+TRIGGER_RETRY_INTERVAL = 0.1
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class UpdateCoordinator:
+    """
+    Single-flight guard for update jobs shared by all threads and worker processes.
+
+    A job only starts when its caller wins an exclusive flock on the lock file;
+    triggers arriving while a job holds the lock are merged into it and get the
+    running job id back. Job progress and the last completion time are kept in
+    a JSON status file so every worker can serve them.
+    """
+
+    def __init__(self, lock_path, status_path):
+        self.lock_path = lock_path
+        self.status_path = status_path
+        self._thread_lock = threading.Lock()
+        self._status_lock = threading.Lock()
+
+    def read_status(self):
+        """Return the current or last job status; a running job whose process is gone is reported failed."""
+        try:
+            with open(self.status_path) as f:
+                status = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {"job_id": None, "state": "idle", "last_completed_at": None}
+        if status.get("state") == "running" and status.get("pid") and not _pid_alive(status["pid"]):
+            status.update(state="failed", error=f"Update process {status['pid']} exited before the job finished")
+        return status
+
+    def _write_status(self, status):
+        with self._status_lock:
+            tmp_path = f"{self.status_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(status, f, default=str)
+            os.replace(tmp_path, self.status_path)
+
+    def _try_lock(self):
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        fd = os.open(self.lock_path, os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+    @contextmanager
+    def _status_locked(self):
+        # Serializes triggers across processes, so a merged trigger never reads
+        # the status before the lock winner has written its job id
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        fd = os.open(f"{self.lock_path}.status", os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    @contextmanager
+    def try_locked(self):
+        """
+        Hold the update lock for a short write outside an update job. Yields
+        False without waiting when an update job (or another writer) holds it.
+        """
+        fd = self._try_lock()
+        try:
+            yield fd is not None
+        finally:
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+    def trigger(self, job, total_stages=None):
+        """
+        Start job(on_stage) in a background thread unless an update is already
+        running anywhere. Returns (job_id, started). While a short write outside
+        a job holds the lock, the trigger waits up to TRIGGER_WAIT_SECONDS for it.
+        """
+        waited_until = time.monotonic() + TRIGGER_WAIT_SECONDS
+        while True:
+            with self._thread_lock, self._status_locked():
+                fd = self._try_lock()
+                if fd is not None:
+                    return self._start(fd, job, total_stages), True
+                status = self.read_status()
+                if status.get("state") == "running" or time.monotonic() > waited_until:
+                    logging.info(f"Update already running, merged trigger into job {status.get('job_id')}")
+                    return status.get("job_id"), False
+            # A short write outside a job (e.g. a stream flush) holds the lock; start once it is done
+            time.sleep(TRIGGER_RETRY_INTERVAL)
+
+    def _start(self, fd, job, total_stages):
+        """Write the running status of a new job while holding the status lock, then run it; returns the job id."""
+        previous = self.read_status()
+        job_id = uuid.uuid4().hex[:12]
+        status = {
+            "job_id": job_id,
+            "state": "running",
+            "pid": os.getpid(),
+            "started_at": datetime.now().isoformat(),
+            "finished_at": None,
+            "progress": {"completed_stages": 0, "total_stages": total_stages, "percent": 0.0},
+            "sources": {},
+            "error": None,
+            "last_completed_at": previous.get("last_completed_at"),
+            "last_report": previous.get("last_report"),
+        }
+        self._write_status(status)
+        thread = threading.Thread(target=self._run, args=(fd, job, status), name=f"update-{job_id}", daemon=True)
+        thread.start()
+        return job_id
+
+    def _run(self, fd, job, status):
+        stage_started = {}
+
+        def on_stage(source, stage, event):
+            now = time.perf_counter()
+            with self._status_lock:
+                timings = status["sources"].setdefault(source, {})
+                if event == "started":
+                    stage_started[(source, stage)] = now
+                else:
+                    timings[stage] = round(now - stage_started.pop((source, stage), now), 4)
+                    progress = status["progress"]
+                    progress["completed_stages"] += 1
+                    if progress["total_stages"]:
+                        progress["percent"] = round(100.0 * progress["completed_stages"] / progress["total_stages"], 1)
+            self._write_status(status)
+
+        try:
+            report = job(on_stage)
+            status["state"] = "completed"
+            if report is not None:
+                status["sources"] = report["sources"]
+                status["last_report"] = report
+        except Exception as e:
+            logging.error(f"Update job {status['job_id']} failed: {e}")
+            status["state"] = "failed"
+            status["error"] = str(e)
+        finally:
+            status["finished_at"] = datetime.now().isoformat()
+            if status["state"] == "completed":
+                status["last_completed_at"] = status["finished_at"]
+            self._write_status(status)
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+
+update_coordinator = UpdateCoordinator(update_lock_path, update_status_path)
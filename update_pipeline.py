@@ -0,0 +1,184 @@
+import time
+import logging
+from collections import defaultdict
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from model import train_model
+from sources import plugin_for
+from config import update_workers, update_source_timeout, update_source_timeouts
+from assets import catalog
+from metrics import timed
+import price_store
+
+# Stages run for every asset: the source plugin's plan + fetch, its parse + append, then training
+STAGES = ("download", "format", "train")
+
+
+# Longest wait between deadline checks while assets are still queued for a worker thread
+QUEUED_POLL_INTERVAL = 1.0
+
+
+class StageTimeout(Exception):
+    pass
+
+
+def _train_stage(asset, check):
+    if not price_store.exists(asset["data_path"]):
+        raise FileNotFoundError(f"{asset['key']} data file not found after download.")
+    train_model(asset["data_path"], asset["model_path"])
+
+
+def _source_stages(asset):
+    plugin = plugin_for(asset)
+    fetched = {}
+
+    def download(asset, check):
+        fetched["raw"] = plugin.download(asset)
+
+    def format_data(asset, check):
+        parsed = plugin.parse(asset, fetched.pop("raw"))
+        # Nothing is written to the price store once the asset is out of time
+        check("append")
+        plugin.append(asset, parsed)
+
+    return list(zip(STAGES, (download, format_data, _train_stage)))
+
+
+def _run_source(asset, budget, entry, deadlines, on_stage):
+    """
+    Run the download -> format -> train chain of one asset, recording per-stage
+    timings in entry. The asset's time budget starts now, when a worker thread
+    picks it up; its deadline is published in deadlines for run_pipeline.
+    """
+    source = asset["key"]
+    deadline = time.monotonic() + budget
+    deadlines[source] = deadline
+    entry["status"] = "running"
+
+    def check(step):
+        if time.monotonic() > deadline:
+            raise StageTimeout(f"{source} exceeded its time budget before {step}")
+
+    try:
+        for stage, func in _source_stages(asset):
+            check(stage)
+            if on_stage:
+                on_stage(source, stage, "started")
+            start = time.perf_counter()
+            try:
+                with timed(stage, source):
+                    func(asset, check)
+            finally:
+                entry["stages"][stage] = round(time.perf_counter() - start, 4)
+            if on_stage:
+                on_stage(source, stage, "finished")
+        entry["status"] = "ok"
+    except Exception as e:
+        entry["status"] = "timeout" if isinstance(e, StageTimeout) else "failed"
+        entry["error"] = str(e)
+        logging.error(f"Update of {source} failed: {e}")
+    return entry
+
+
+def _source_timeout(asset, timeout):
+    if timeout is not None:
+        return timeout
+    return update_source_timeouts.get(
+        asset["key"], update_source_timeouts.get(asset["source"], update_source_timeout)
+    )
+
+
+def stage_count(sources=None):
+    """Total number of stages run_pipeline runs for the given asset keys, including training."""
+    return len(STAGES) * len(list(sources or catalog))
+
+
+def run_pipeline(sources=None, timeout=None, max_workers=update_workers, on_stage=None):
+    """
+    Update the given catalog assets (asset keys, all by default) concurrently.
+
+    Each asset runs its own download -> format -> train chain in a thread
+    pool, so assets download and train in parallel. Assets aggregated from
+    another asset start when it is done; they are skipped when it timed out.
+    A failure only affects its own asset. An asset that exceeds its timeout
+    (`timeout` seconds from when a worker picks it up, or the configured
+    per-asset or per-source default) is reported as timed out and stops
+    before its next write. Its thread is still joined before returning, so
+    nothing writes to the stores after the caller releases the update lock.
+    Returns a report keyed by asset key with the status, per-stage timings in
+    seconds and the error, if any.
+    """
+    sources = list(sources or catalog)
+    unknown = [source for source in sources if source not in catalog]
+    if unknown:
+        raise ValueError(f"Asset(s) {unknown} not in the catalog")
+
+    report = {
+        "started_at": datetime.now().isoformat(),
+        "finished_at": None,
+        "seconds": None,
+        "sources": {},
+    }
+    entries = {source: {"status": "pending", "stages": {}, "error": None} for source in sources}
+
+    # Aggregated assets start once their base asset is done in this run
+    waiting = defaultdict(list)
+    for source in sources:
+        if catalog[source].get("base_key") in sources:
+            waiting[catalog[source]["base_key"]].append(source)
+
+    start = time.perf_counter()
+    deadlines = {}
+    futures = {}
+    pending = set()
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="update")
+
+    def submit(keys):
+        for source in keys:
+            budget = _source_timeout(catalog[source], timeout)
+            future = executor.submit(_run_source, catalog[source], budget, entries[source], deadlines, on_stage)
+            futures[future] = source
+            pending.add(future)
+
+    def skip_derived(base_key):
+        for source in waiting.pop(base_key, []):
+            report["sources"][source] = dict(
+                entries[source], status="failed", error=f"Skipped, its base asset {base_key} timed out",
+            )
+            logging.error(f"Skipping {source}: its base asset {base_key} timed out")
+
+    submit([source for source in sources if catalog[source].get("base_key") not in sources])
+    while pending:
+        now = time.monotonic()
+        for future in [f for f in pending if now >= deadlines.get(futures[f], float("inf"))]:
+            source = futures[future]
+            pending.discard(future)
+            # Snapshot the entry; the thread keeps running until its next deadline check
+            report["sources"][source] = dict(
+                entries[source], status="timeout", stages=dict(entries[source]["stages"]),
+                error=f"{source} did not finish within its time budget",
+            )
+            logging.error(report["sources"][source]["error"])
+            skip_derived(source)
+        if not pending:
+            break
+        # Queued assets have no deadline until they start, so look again at least every poll interval
+        next_deadline = min((deadlines[futures[f]] for f in pending if futures[f] in deadlines), default=float("inf"))
+        wait_for = min(next_deadline - now, QUEUED_POLL_INTERVAL)
+        done, _ = wait(pending, timeout=max(0.0, wait_for), return_when=FIRST_COMPLETED)
+        for future in done:
+            entry = future.result()
+            report["sources"][futures[future]] = entry
+            if entry["status"] == "timeout":
+                skip_derived(futures[future])
+            else:
+                submit(waiting.pop(futures[future], []))
+        pending -= done
+    # Timed-out threads stop at their next deadline check; wait for them so no
+    # store or model is written after the update lock is released
+    executor.shutdown(wait=True)
+
+    report["sources"] = {source: report["sources"][source] for source in sources}
+    report["seconds"] = round(time.perf_counter() - start, 4)
+    report["finished_at"] = datetime.now().isoformat()
+    return report
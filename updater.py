@@ -1,135 +1,109 @@
 import os
-import requests
 import logging
-from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime
+from datetime import datetime, timedelta
+from config import binance_base_url
+from assets import catalog
+from downloader import default_downloader
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Base paths for data storage
-data_base_path = "data"
-binance_data_path = os.path.join(data_base_path, "binance/futures-klines")
-coingecko_data_path = os.path.join(data_base_path, "coingecko_eth_price_data.csv")
-cmc_data_path = os.path.join(data_base_path, "cmc_eth_price_data.csv")
-portalsfi_data_path = os.path.join(data_base_path, "portalsfi_eth_price_data.csv")
+def _month_range(start, end):
+    """Yield (year, month) pairs from the month of start to the month of end, inclusive."""
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
 
-def download_url(url, download_path):
-    target_file_path = os.path.join(download_path, os.path.basename(url)) 
-    if os.path.exists(target_file_path):
-        logging.info(f"File already exists: {url}")
-        return
-    
-    response = requests.get(url)
-    if response.status_code == 404:
-        logging.warning(f"File does not exist: {url}")
-    else:
-        os.makedirs(os.path.dirname(target_file_path), exist_ok=True)
-        with open(target_file_path, "wb") as f:
-            f.write(response.content)
-        logging.info(f"Downloaded: {url} to {target_file_path}")
+def plan_binance_archives(symbol, interval, listing_date, today, existing_files):
+    """
+    Work out which Binance kline archives are missing locally.
 
-def download_binance_monthly_data(cm_or_um, symbols, intervals, years, months, download_path):
-    if cm_or_um not in ["cm", "um"]:
-        logging.error("CM_OR_UM can be only cm or um")
-        return
-    base_url = f"https://data.binance.vision/data/futures/{cm_or_um}/monthly/klines"
-    with ThreadPoolExecutor() as executor:
-        for symbol in symbols:
-            for interval in intervals:
-                for year in years:
-                    for month in months:
-                        url = f"{base_url}/{symbol}/{interval}/{symbol}-{interval}-{year}-{month}.zip"
-                        executor.submit(download_url, url, download_path)
+    Monthly archives are planned for every complete month since the listing
+    date. Daily archives are planned for the current month up to yesterday,
+    and for last month while its monthly archive has not been downloaded yet
+    (Binance publishes it a few days after the month ends). Returns a tuple of
+    (monthly, daily) archive names.
+    """
+    existing_files = set(existing_files)
+    listing_date = datetime.strptime(str(listing_date), "%Y-%m-%d").date() if isinstance(listing_date, str) else listing_date
+    yesterday = today - timedelta(days=1)
+    if yesterday < listing_date:
+        return [], []
+
+    current_month_start = today.replace(day=1)
+    last_month_end = current_month_start - timedelta(days=1)
+    monthly, daily = [], []
+    if last_month_end >= listing_date:
+        for year, month in _month_range(listing_date, last_month_end):
+            name = f"{symbol}-{interval}-{year}-{month:02d}.zip"
+            if name not in existing_files:
+                monthly.append(name)
+
+    daily_start = max(listing_date, current_month_start)
+    if f"{symbol}-{interval}-{last_month_end.year}-{last_month_end.month:02d}.zip" not in existing_files:
+        daily_start = max(listing_date, last_month_end.replace(day=1))
+    day = daily_start
+    while day <= yesterday:
+        name = f"{symbol}-{interval}-{day.year}-{day.month:02d}-{day.day:02d}.zip"
+        if name not in existing_files:
+            daily.append(name)
+        day += timedelta(days=1)
+    return monthly, daily
 
-def download_binance_daily_data(cm_or_um, symbols, intervals, year, month, download_path):
+def monthly_archive_name(file):
+    """
+    Return the monthly archive name that replaces a daily archive, or None for monthly archives.
+    e.g. ETHUSDT-1d-2024-06-03.zip -> ETHUSDT-1d-2024-06.zip
+    """
+    parts = file[:-len(".zip")].split("-")
+    if len(parts) >= 5 and all(part.isdigit() for part in parts[-3:]):
+        return "-".join(parts[:-1]) + ".zip"
+    return None
+
+def prune_daily_archives(download_path):
+    """Delete daily archives whose monthly archive has been downloaded. Returns the removed names."""
+    if not os.path.isdir(download_path):
+        return []
+    files = set(x for x in os.listdir(download_path) if x.endswith(".zip"))
+    removed = []
+    for file in sorted(files):
+        if monthly_archive_name(file) in files:
+            os.remove(os.path.join(download_path, file))
+            removed.append(file)
+    if removed:
+        logging.info(f"Pruned {len(removed)} daily archives replaced by monthly archives.")
+    return removed
+
+def download_binance_archives(cm_or_um, symbol, interval, monthly, daily, download_path):
+    """
+    Download the planned monthly, then daily archives of one symbol and
+    interval (see plan_binance_archives). Daily archives of a month whose
+    monthly archive was just downloaded are skipped.
+    """
     if cm_or_um not in ["cm", "um"]:
         logging.error("CM_OR_UM can be only cm or um")
-        return
-    base_url = f"https://data.binance.vision/data/futures/{cm_or_um}/daily/klines"
-    with ThreadPoolExecutor() as executor:
-        for symbol in symbols:
-            for interval in intervals:
-                for day in range(1, 32):
-                    url = f"{base_url}/{symbol}/{interval}/{symbol}-{interval}-{year}-{month:02d}-{day:02d}.zip"
-                    executor.submit(download_url, url, download_path)
+        return []
+    prune_daily_archives(download_path)
+    base_url = f"{binance_base_url}/data/futures/{cm_or_um}"
 
-def download_coingecko_data():
-    url = "https://api.coingecko.com/api/v3/coins/ethereum/market_chart?vs_currency=usd&days=30&interval=daily"
-    headers = {
-        "accept": "application/json",
-        "x-cg-demo-api-key": "CG-HERE"  # replace with your API key
-    }
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        data = response.json()
-        df = pd.DataFrame(data["prices"])
-        df.columns = ["date", "price"]
-        df["date"] = pd.to_datetime(df["date"], unit="ms")
-        df = df[:-1]
-        df.to_csv(coingecko_data_path, index=False)
-        logging.info(f"Downloaded CoinGecko data to {coingecko_data_path}.")
-    else:
-        logging.error(f"Failed to retrieve data from CoinGecko: {response.text}")
+    urls = [f"{base_url}/monthly/klines/{symbol}/{interval}/{name}" for name in monthly]
+    results = default_downloader.download_many(urls, download_path) if urls else []
 
-def download_cmc_data():
-    url = 'https://sandbox-api.coinmarketcap.com/v1/cryptocurrency/listings/latest'
-    parameters = {
-        'start': '1',
-        'limit': '5000',
-        'convert': 'USD'
-    }
-    headers = {
-        'Accepts': 'application/json',
-        'X-CMC_PRO_API_KEY': 'HERE',  # replace with your API key
-    }
-    response = requests.get(url, headers=headers, params=parameters)
-    if response.status_code == 200:
-        data = response.json()
-        eth_data = next(item for item in data['data'] if item['symbol'] == 'ETH')
-        df = pd.DataFrame([{
-            "date": datetime.now(),
-            "price": eth_data['quote']['USD']['price']
-        }])
-        df.to_csv(cmc_data_path, index=False)
-        logging.info(f"Downloaded CoinMarketCap data to {cmc_data_path}.")
-    else:
-        logging.error(f"Failed to retrieve data from CoinMarketCap: {response.text}")
+    # Binance publishes last month's archive a few days after the month ends
+    fetched = {os.path.basename(result["url"]) for result in results if result["status"] in ("downloaded", "exists")}
+    daily = [name for name in daily if monthly_archive_name(name) not in fetched]
+    urls = [f"{base_url}/daily/klines/{symbol}/{interval}/{name}" for name in daily]
+    results += default_downloader.download_many(urls, download_path) if urls else []
+    logging.info(f"Downloaded plan for {symbol} {interval}: {len(monthly)} monthly, {len(daily)} daily archives.")
 
-def download_portalsfi_data():
-    url = "https://api.portals.fi/v2/tokens?search=eth&platforms=native&networks=ethereum"
-    headers = {
-        "Authorization": "HERE"  # replace with your API key
-    }
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        data = response.json()
-        eth_data = next(item for item in data if item['symbol'].upper() == 'ETH')
-        df = pd.DataFrame([{
-            "date": datetime.now(),
-            "price": eth_data['price_usd']
-        }])
-        df.to_csv(portalsfi_data_path, index=False)
-        logging.info(f"Downloaded Portals.fi data to {portalsfi_data_path}.")
-    else:
-        logging.error(f"Failed to retrieve data from Portals.fi: {response.text}")
+    prune_daily_archives(download_path)
+    return results
 
 if __name__ == "__main__":
-    # Binance data
-    logging.info("Starting download of Binance data...")
-    download_binance_monthly_data("um", ["ETHUSDT"], ["1d"], ["2018", "2019", "2020", "2021", "2022", "2023", "2024"], ["01", "02", "03", "04", "05", "06", "07", "08", "09", "10", "11", "12"], binance_data_path)
-    current_year = datetime.now().year
-    current_month = datetime.now().month
-    download_binance_daily_data("um", ["ETHUSDT"], ["1d"], current_year, current_month, binance_data_path)
-
-    # CoinGecko data
-    logging.info("Starting download of CoinGecko data...")
-    download_coingecko_data()
-
-    # CoinMarketCap data
-    logging.info("Starting download of CoinMarketCap data...")
-    download_cmc_data()
+    # Download the missing data of every catalog asset without formatting or training
+    from sources import plugin_for
 
-    # Portals.fi data
-    logging.info("Starting download of Portals.fi data...")
-    download_portalsfi_data()
+    for asset in catalog.values():
+        logging.info(f"Starting download of {asset['key']} data...")
+        plugin_for(asset).download(asset)